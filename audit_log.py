@@ -0,0 +1,324 @@
+"""
+Append-only audit log of classification decisions
+
+Records are queued by the request thread and written as JSON lines by a
+background thread in batches, into size-rotated segment files
+(audit-000001.jsonl, audit-000002.jsonl, ...).
+
+Usage:
+    python audit_log.py [directory] [--category CATEGORY]
+
+streams the stored records to stdout, oldest first.
+"""
+import os
+import re
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+
+SEGMENT_PATTERN = re.compile(r"^audit-(\d{6})\.jsonl$")
+FSYNC_POLICIES = ("always", "batch", "interval", "never")
+OVERFLOW_POLICIES = ("drop", "block")
+_STOP = object()
+
+
+def list_segments(directory):
+    """
+    Segment files of an audit log, oldest first
+
+    Args:
+        directory (str): Audit log directory
+
+    Returns:
+        list: (number, path) tuples sorted by segment number
+    """
+    if not os.path.isdir(directory):
+        return []
+    segments = []
+    for name in os.listdir(directory):
+        match = SEGMENT_PATTERN.match(name)
+        if match:
+            segments.append((int(match.group(1)), os.path.join(directory, name)))
+    return sorted(segments)
+
+
+def recover_segment(path):
+    """
+    Truncate a torn final record left by a crash mid-write
+
+    Args:
+        path (str): Segment file
+
+    Returns:
+        int: Number of bytes removed
+    """
+    with open(path, 'rb+') as f:
+        size = f.seek(0, os.SEEK_END)
+        if size == 0:
+            return 0
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return 0
+        # Scan backwards for the end of the last complete record
+        position = size
+        while position > 0:
+            step = min(65536, position)
+            position -= step
+            f.seek(position)
+            chunk = f.read(step)
+            newline = chunk.rfind(b"\n")
+            if newline != -1:
+                end = position + newline + 1
+                break
+        else:
+            end = 0
+        f.truncate(end)
+        return size - end
+
+
+def read_audit_log(directory):
+    """
+    Stream records from an audit log, oldest first
+
+    Lines that are not valid JSON (e.g. a record torn by a crash that has
+    not been recovered yet) are skipped.
+
+    Args:
+        directory (str): Audit log directory
+
+    Yields:
+        dict: One audit record
+    """
+    for _, path in list_segments(directory):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+class AuditLog:
+    """
+    Non-blocking, batched writer for audit records
+
+    log() only puts the record on a bounded queue. A background thread
+    drains up to batch_size records at a time, writes them with a single
+    write call and syncs them to disk according to the fsync policy:
+    'always' fsyncs after every record, 'batch' after every batch,
+    'interval' at most every fsync_interval seconds, and 'never' leaves it
+    to the OS. When the queue is full, 'drop' discards the record and
+    counts it, while 'block' waits up to block_timeout for space. A batch
+    that cannot be written (e.g. the disk is full) is counted as failed
+    and the writer carries on with the next one.
+    """
+    def __init__(self, directory="audit_logs", max_bytes=64 * 1024 * 1024, queue_size=10000,
+                 batch_size=256, flush_interval=1.0, fsync="batch", fsync_interval=1.0,
+                 overflow="drop", block_timeout=0.05):
+        """
+        Open the log, recovering its last segment, and start the writer
+
+        Args:
+            directory (str): Directory holding the segment files
+            max_bytes (int): Segment size that triggers rotation
+            queue_size (int): Maximum records waiting to be written
+            batch_size (int): Maximum records per write
+            flush_interval (float): Longest time a record waits in the queue
+            fsync (str): One of 'always', 'batch', 'interval' or 'never'
+            fsync_interval (float): Seconds between fsyncs for 'interval'
+            overflow (str): 'drop' or 'block' when the queue is full
+            block_timeout (float): Longest wait for queue space with 'block'
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}")
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.write_errors = 0
+        self.last_error = None
+        self.recovered_bytes = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._last_fsync = time.monotonic()
+
+        os.makedirs(directory, exist_ok=True)
+        segments = list_segments(directory)
+        if segments:
+            self._segment, path = segments[-1]
+            self.recovered_bytes = recover_segment(path)
+        else:
+            self._segment = 1
+        self._file = open(self._segment_path(), 'ab')
+
+        self._thread = threading.Thread(target=self._run, name="audit-log", daemon=True)
+        self._thread.start()
+
+    def _segment_path(self):
+        return os.path.join(self.directory, f"audit-{self._segment:06d}.jsonl")
+
+    def log(self, record):
+        """
+        Queue a record for writing without waiting for disk
+
+        Args:
+            record (dict): JSON-serializable audit record
+
+        Returns:
+            bool: False if the record was dropped because the queue was full
+        """
+        try:
+            if self.overflow == "block":
+                self._queue.put(record, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _run(self):
+        running = True
+        while running:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                self._guarded(self._sync, False)
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if any(record is _STOP for record in batch):
+                batch = [record for record in batch if record is not _STOP]
+                running = False
+            if batch:
+                self._write(batch)
+        self._guarded(self._sync, True)
+        if self._file is not None:
+            self._guarded(self._file.close)
+
+    def _guarded(self, action, *args):
+        # Disk errors are counted instead of ending the writer thread
+        try:
+            action(*args)
+            return True
+        except OSError as e:
+            self.write_errors += 1
+            self.last_error = str(e)
+            print(f"⚠️ Audit log write failed: {e}")
+            return False
+
+    def _reopen(self):
+        # Drop a record torn by the failed write and continue the segment
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+        path = self._segment_path()
+        if os.path.exists(path):
+            recover_segment(path)
+        self._file = open(path, 'ab')
+
+    def _write(self, batch):
+        lines = []
+        for record in batch:
+            try:
+                # Lone surrogates from the request body cannot be encoded
+                # as UTF-8; they are kept as \u escapes that read back as-is
+                line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+                lines.append(line.encode('utf-8', errors='backslashreplace'))
+            except (TypeError, ValueError) as e:
+                print(f"⚠️ Skipping unserializable audit record: {e}")
+        if not lines:
+            return
+        if not self._guarded(self._write_lines, lines):
+            self.failed += len(lines)
+            self._guarded(self._reopen)
+            return
+        self.written += len(lines)
+
+    def _write_lines(self, lines):
+        if self._file is None:
+            self._reopen()
+        data = b"".join(lines)
+        if self._file.tell() > 0 and self._file.tell() + len(data) > self.max_bytes:
+            self._sync(force=True)
+            self._file.close()
+            self._file = None
+            self._segment += 1
+            self._file = open(self._segment_path(), 'ab')
+
+        if self.fsync == "always":
+            for line in lines:
+                self._file.write(line)
+                self._file.flush()
+                self._sync(force=True)
+        else:
+            self._file.write(data)
+            self._file.flush()
+            self._sync(force=self.fsync == "batch")
+
+    def _sync(self, force):
+        if self.fsync == "never" or self._file is None:
+            return
+        now = time.monotonic()
+        if force or (self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval):
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+
+    def close(self):
+        """
+        Write everything still queued, fsync and stop the writer thread
+        """
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def stats(self):
+        return {
+            "directory": self.directory,
+            "segment": self._segment,
+            "queued": self._queue.qsize(),
+            "writer_alive": self._thread.is_alive(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "write_errors": self.write_errors,
+            "last_error": self.last_error,
+            "recovered_bytes": self.recovered_bytes,
+            "fsync": self.fsync
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream records from an audit log")
+    parser.add_argument("directory", nargs="?", default="audit_logs")
+    parser.add_argument("--category", help="Only print records with this category")
+    args = parser.parse_args()
+
+    for record in read_audit_log(args.directory):
+        if args.category is None or record.get("category") == args.category:
+            sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
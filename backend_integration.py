@@ -1,7 +1,22 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
 import os
 import json
+import math
+import hmac
+import time
+import pickle
+import atexit
+import threading
+from datetime import datetime, timezone
+from model_watcher import ModelWatcher, read_artifact
+from load_shedding import LoadShedder
+from taxonomy import load_taxonomy
+from complaint_clustering import ComplaintClusterer
+from trend_aggregator import TrendAggregator
+from audit_log import AuditLog
+from shadow_runner import ShadowRunner
+import sampling_profiler
 
 try:
     from sbert_classifier import SBERTQueryClassifier as Classifier
@@ -13,35 +28,170 @@ CORS(app)
 
 MODEL_PICKLE = "model.pkl"
 TRAINING_JSON = "training_data.json"
+TENANTS_DIR = os.environ.get("TENANTS_DIR", "tenants")
+TENANT_MEMORY_MB = float(os.environ.get("TENANT_MEMORY_MB", 256))
+MODEL_WATCH_INTERVAL = float(os.environ.get("MODEL_WATCH_INTERVAL", 5))
+AUDIT_LOG_DIR = os.environ.get("AUDIT_LOG_DIR", "audit_logs")
+LONG_TEXT_WORDS = int(os.environ.get("LONG_TEXT_WORDS", 40))
+SHADOW_MODEL = os.environ.get("SHADOW_MODEL", "")
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+complaint_clusterer = ComplaintClusterer(
+    window_seconds=float(os.environ.get("CLUSTER_WINDOW_SECONDS", 3600))
+)
+trend_aggregator = TrendAggregator(
+    bucket_seconds=int(os.environ.get("TREND_BUCKET_SECONDS", 60))
+)
+load_shedder = LoadShedder(
+    p95_threshold_ms=float(os.environ.get("SHED_P95_MS", 500)),
+    max_in_flight=int(os.environ.get("SHED_MAX_IN_FLIGHT", 8))
+)
+
+# (classifier, model_info) of the serving model, rebound as one tuple so
+# a request never pairs a model with another model's version
+active_model = None
+tenant_registry = None
+model_watcher = None
+audit_log = None
+shadow_runner = None
+_load_lock = threading.Lock()
+
+
+def _set_active_model(clf, version, load_seconds):
+    # Requests grab the module-level reference once, so rebinding it switches
+    # new traffic while in-flight requests finish on the previous model.
+    global active_model
+    active_model = (clf, {
+        "version": version,
+        "model_class": type(clf).__name__,
+        "loaded_at": datetime.now(timezone.utc).isoformat(),
+        "load_seconds": load_seconds
+    })
+    if tenant_registry is not None:
+        tenant_registry.set_classifier(clf)
+
+
+def get_active_model():
+    if active_model is not None:
+        return active_model
+    with _load_lock:
+        if active_model is None:
+            start = time.perf_counter()
+            clf, version = _load_initial_classifier()
+            _set_active_model(clf, version, time.perf_counter() - start)
+            # Started with the first model rather than under __main__, so
+            # they also run under `flask run` and WSGI servers
+            start_model_watcher()
+            start_shadow_runner()
+    return active_model
 
-classifier = None
 
 def load_or_init_classifier():
-    global classifier
-    if classifier is not None:
-        return classifier
+    return get_active_model()[0]
+
 
+def _load_model_bytes(data):
+    return pickle.loads(data)
+
+
+def _load_initial_classifier():
     if os.path.exists(MODEL_PICKLE):
         try:
-            from sbert_classifier import SBERTQueryClassifier
-            classifier = SBERTQueryClassifier.load_model(MODEL_PICKLE)
+            data, version = read_artifact(MODEL_PICKLE)
+            classifier = _load_model_bytes(data)
             print("✅ Loaded SBERT model")
-            return classifier
+            return classifier, version
         except Exception as e:
             print(f"⚠️ Could not load model.pkl: {e}")
 
-    classifier = Classifier()
+    taxonomy = load_taxonomy("civic")
     if os.path.exists(TRAINING_JSON):
         with open(TRAINING_JSON, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            if hasattr(classifier, "categories"):
-                for cat, examples in data.items():
-                    if cat in classifier.categories:
-                        for ex in examples:
-                            classifier.categories[cat]["examples"].append(ex)
-        if hasattr(classifier, "train"):
-            classifier.train()
-    return classifier
+            taxonomy = taxonomy.with_examples(json.load(f))
+    classifier = Classifier(taxonomy=taxonomy)
+    if hasattr(classifier, "train"):
+        classifier.train()
+    return classifier, "trained-at-startup"
+
+
+def start_model_watcher():
+    global model_watcher
+    if model_watcher is None and MODEL_WATCH_INTERVAL > 0:
+        model_watcher = ModelWatcher(
+            MODEL_PICKLE, _load_model_bytes, _on_model_reloaded, interval=MODEL_WATCH_INTERVAL
+        )
+        model_watcher.start()
+    return model_watcher
+
+
+def _on_model_reloaded(clf, version, load_seconds):
+    _set_active_model(clf, version, load_seconds)
+    print(f"✅ Switched to model {version} (loaded in {load_seconds:.2f}s)")
+
+
+def get_audit_log():
+    global audit_log
+    if audit_log is None and AUDIT_LOG_DIR:
+        with _load_lock:
+            if audit_log is None:
+                audit_log = AuditLog(
+                    AUDIT_LOG_DIR,
+                    max_bytes=int(float(os.environ.get("AUDIT_MAX_MB", 64)) * 1024 * 1024),
+                    fsync=os.environ.get("AUDIT_FSYNC", "batch")
+                )
+                atexit.register(audit_log.close)
+    return audit_log
+
+
+def record_decision(query, details, version, tenant=None):
+    log = get_audit_log()
+    if log is None:
+        return
+    record = {
+        "ts": time.time(),
+        "query": query,
+        "category": details["category"],
+        "confidence_scores": details["confidence_scores"],
+        "model_version": version,
+        "degraded": details.get("degraded", False)
+    }
+    if tenant:
+        record["tenant"] = tenant
+    if details.get("labels") is not None:
+        record["labels"] = details["labels"]
+    if "cluster_id" in details:
+        record["cluster_id"] = details["cluster_id"]
+    log.log(record)
+
+
+def start_shadow_runner():
+    global shadow_runner
+    if shadow_runner is None and SHADOW_MODEL:
+        try:
+            data, version = read_artifact(SHADOW_MODEL)
+            candidate = _load_model_bytes(data)
+        except Exception as e:
+            print(f"⚠️ Could not load shadow model {SHADOW_MODEL}: {e}")
+            return None
+        shadow_runner = ShadowRunner(
+            candidate,
+            version=version,
+            sample_rate=float(os.environ.get("SHADOW_SAMPLE_RATE", 0.1)),
+            cpu_share=float(os.environ.get("SHADOW_CPU_SHARE", 0.1))
+        )
+        atexit.register(shadow_runner.close)
+        print(f"✅ Shadowing {SHADOW_MODEL} on {shadow_runner.sample_rate:.0%} of queries")
+    return shadow_runner
+
+
+def get_tenant_registry():
+    global tenant_registry
+    if tenant_registry is None:
+        from tenant_registry import TenantRegistry
+        tenant_registry = TenantRegistry(
+            load_or_init_classifier(), TENANTS_DIR, memory_budget_mb=TENANT_MEMORY_MB
+        )
+    return tenant_registry
 
 
 @app.route("/")
@@ -55,20 +205,156 @@ def classify():
     if not data or "query" not in data:
         return jsonify({"error": "Missing 'query'"}), 400
 
-    clf = load_or_init_classifier()
     query = data["query"]
+    locality = data.get("locality")
+    if locality is not None and not isinstance(locality, str):
+        return jsonify({"error": "'locality' must be a string"}), 400
+    tenant = request.headers.get("X-Tenant-ID") or data.get("tenant")
+    if tenant:
+        return classify_for_tenant(tenant, query, locality)
+
+    clf, info = get_active_model()
+    version = info["version"]
     try:
-        category = clf.classify_query(query)
-        confidence = clf.get_confidence_scores(query)
-        return jsonify({
-            "query": query,
-            "category": category,
-            "confidence_scores": confidence
-        })
+        if hasattr(clf, "classify_with_details"):
+            multi_label = bool(data.get("multi_label")) or len(query.split()) > LONG_TEXT_WORDS
+            details = classify_with_shedding(clf, query, multi_label)
+        else:
+            details = {
+                "category": clf.classify_query(query),
+                "confidence_scores": clf.get_confidence_scores(query),
+                "degraded": False
+            }
+        details.update(complaint_clusterer.assign(
+            query, category=details["category"], embedding=details.pop("embedding", None)
+        ))
+        trend_aggregator.record(details["category"], locality)
+        record_decision(query, details, version)
+        # Multi-label and degraded answers are not comparable with the
+        # candidate's single-label semantic answer
+        if shadow_runner is not None and "labels" not in details and not details.get("degraded"):
+            shadow_runner.submit(query, details["category"], details["confidence_scores"])
+        return jsonify({"query": query, **details})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def classify_with_shedding(clf, query, multi_label=False):
+    # Long multi-issue complaints are chunked and get one label per issue
+    multi_label = multi_label and hasattr(clf, "classify_long")
+    shed_reason = load_shedder.should_shed()
+    if shed_reason is not None:
+        if multi_label:
+            details = clf.classify_long(query, semantic=False)
+        else:
+            details = clf.classify_with_details(query, semantic=False)
+        details["degraded_reason"] = f"load_shedding:{shed_reason}"
+        return details
+    with load_shedder.track():
+        if multi_label:
+            return clf.classify_long(query)
+        return clf.classify_with_details(query, include_embedding=True)
+
+
+def classify_tenant_with_shedding(registry, tenant, query):
+    # Tenants share the default encoder, so they are shed under the same pressure
+    shed_reason = load_shedder.should_shed()
+    if shed_reason is not None:
+        details = registry.classify_with_details(tenant, query, semantic=False)
+        details["degraded_reason"] = f"load_shedding:{shed_reason}"
+        return details
+    with load_shedder.track():
+        return registry.classify_with_details(tenant, query)
+
+
+def classify_for_tenant(tenant, query, locality=None):
+    try:
+        details = classify_tenant_with_shedding(get_tenant_registry(), tenant, query)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except KeyError as e:
+        return jsonify({"error": e.args[0]}), 404
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    # Clusters and trends are scoped to the tenant, so neither reveals other
+    # tenants' traffic
+    details.update(complaint_clusterer.assign(query, category=details["category"], scope=tenant))
+    trend_aggregator.record(details["category"], locality, tenant=tenant)
+    record_decision(query, details, details["model_version"], tenant=tenant)
+    return jsonify({"query": query, "tenant": tenant, **details})
+
+
+@app.route("/api/tenants", methods=["GET"])
+def tenants():
+    return jsonify(get_tenant_registry().stats())
+
+
+@app.route("/api/trends", methods=["GET"])
+def trends():
+    return jsonify(trend_aggregator.snapshot(
+        category=request.args.get("category"),
+        locality=request.args.get("locality"),
+        tenant=request.headers.get("X-Tenant-ID") or request.args.get("tenant") or None,
+        include_buckets=request.args.get("buckets", "").lower() in ("1", "true", "yes")
+    ))
+
+
+@app.route("/api/health", methods=["GET"])
+def health():
+    clf = load_or_init_classifier()
+    breaker = getattr(clf, "breaker", None)
+    return jsonify({
+        "load_shedding": load_shedder.stats(),
+        "clustering": complaint_clusterer.stats(),
+        "audit_log": audit_log.stats() if audit_log is not None else None,
+        "circuit_breaker": breaker.state if breaker is not None else None
+    })
+
+
+@app.route("/api/shadow", methods=["GET"])
+def shadow():
+    if shadow_runner is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **shadow_runner.stats()})
+
+
+@app.route("/api/model", methods=["GET"])
+def model():
+    info = dict(get_active_model()[1])
+    info["watching"] = model_watcher is not None and model_watcher.running
+    info["last_reload_error"] = model_watcher.last_error if model_watcher else None
+    return jsonify(info)
+
+
+@app.route("/api/admin/profile", methods=["POST"])
+def profile():
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Profiling is disabled; set ADMIN_TOKEN"}), 403
+    token = request.headers.get("X-Admin-Token", "")
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        return jsonify({"error": "Invalid admin token"}), 401
+
+    try:
+        seconds = float(request.args.get("seconds", 5))
+        interval_ms = float(request.args.get("interval_ms", 5))
+    except ValueError:
+        return jsonify({"error": "'seconds' and 'interval_ms' must be numbers"}), 400
+    if not all(math.isfinite(value) and value > 0 for value in (seconds, interval_ms)):
+        return jsonify({"error": "'seconds' and 'interval_ms' must be positive and finite"}), 400
+    try:
+        result = sampling_profiler.capture(
+            duration=seconds,
+            interval=interval_ms / 1000,
+            include_idle=request.args.get("idle", "").lower() in ("1", "true", "yes")
+        )
+    except sampling_profiler.ProfilerBusy as e:
+        return jsonify({"error": str(e)}), 409
+
+    if request.args.get("format") == "collapsed":
+        return Response(result["collapsed"], mimetype="text/plain")
+    return jsonify(result)
+
+
 if __name__ == "__main__":
     print("🚀 Server starting...")
     load_or_init_classifier()
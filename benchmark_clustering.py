@@ -0,0 +1,87 @@
+"""
+Measure near-duplicate clustering throughput and quality on a synthetic
+complaint stream
+
+Each incident is a complaint template in one locality (numbered sectors
+and named areas). Incidents are repeated with small edits (extra words,
+dropped words) at a fixed arrival rate, so the sliding window keeps
+evicting while clusters keep growing. Purity is the share of queries
+whose cluster's majority incident is their own (low purity means
+different incidents were merged). Completeness is the share of queries
+that sit in their incident's largest cluster (low completeness means one
+incident was split).
+"""
+import time
+import random
+from collections import Counter
+from complaint_clustering import ComplaintClusterer
+
+STREAM = 50000
+ARRIVALS_PER_SECOND = 2000
+WINDOW_SECONDS = 10
+BASES = [
+    "water main burst near {place}, road flooded",
+    "no electricity in {place} since morning",
+    "garbage not collected in {place} for a week",
+    "streetlight broken on main road of {place}",
+    "sewer overflowing outside school in {place}",
+    "huge pothole on the highway near {place}",
+    "loud construction noise at night in {place}",
+    "stray dogs attacking children in {place}",
+]
+PLACES = [f"sector {i}" for i in range(30)] + [
+    "rohini", "dwarka", "saket", "karol bagh", "lajpat nagar", "janakpuri", "pitampura",
+    "mayur vihar", "vasant kunj", "greater kailash"
+]
+FILLERS = ["please help", "urgent", "again", "third time reporting", "kindly fix"]
+
+
+def make_stream(rng, edits=True):
+    stream = []
+    for _ in range(STREAM):
+        incident = (rng.randrange(len(BASES)), rng.randrange(len(PLACES)))
+        words = BASES[incident[0]].format(place=PLACES[incident[1]]).split()
+        if edits and rng.random() < 0.3:
+            words.append(rng.choice(FILLERS))
+        if edits and rng.random() < 0.2:
+            del words[rng.randrange(len(words))]
+        stream.append((incident, " ".join(words)))
+    return stream
+
+
+def quality(incidents, cluster_ids):
+    by_cluster = {}
+    by_incident = {}
+    for incident, cluster_id in zip(incidents, cluster_ids):
+        by_cluster.setdefault(cluster_id, Counter())[incident] += 1
+        by_incident.setdefault(incident, Counter())[cluster_id] += 1
+    purity = sum(max(c.values()) for c in by_cluster.values()) / len(incidents)
+    completeness = sum(max(c.values()) for c in by_incident.values()) / len(incidents)
+    return purity, completeness, len(by_cluster), len(by_incident)
+
+
+def run(stream):
+    clusterer = ComplaintClusterer(window_seconds=WINDOW_SECONDS)
+    cluster_ids = []
+    start = time.perf_counter()
+    for i, (_, text) in enumerate(stream):
+        cluster_ids.append(clusterer.assign(text, now=i / ARRIVALS_PER_SECOND)["cluster_id"])
+    return time.perf_counter() - start, cluster_ids, clusterer.stats()
+
+
+def main():
+    print(f"Queries: {STREAM}, window: {WINDOW_SECONDS}s at {ARRIVALS_PER_SECOND}/s")
+    for label, edits in (("exact repeats", False), ("with edits", True)):
+        stream = make_stream(random.Random(0), edits=edits)
+        elapsed, cluster_ids, stats = run(stream)
+        purity, completeness, clusters, incidents = quality([i for i, _ in stream], cluster_ids)
+        print(f"\n{label}:")
+        print(f"  Throughput: {STREAM / elapsed:,.0f} queries/s ({elapsed / STREAM * 1e6:.1f}us each)")
+        print(f"  Purity: {purity * 100:.2f}%  completeness: {completeness * 100:.2f}%  "
+              f"({clusters} clusters for {incidents} incidents)")
+        print(f"  Entries in window: {stats['entries']}, active clusters: {stats['active_clusters']}, "
+              f"LSH buckets: {stats['buckets']}")
+
+
+if __name__ == "__main__":
+    main()
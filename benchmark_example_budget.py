@@ -0,0 +1,87 @@
+"""
+Report how classification accuracy changes as the per-category example budget shrinks
+
+Every text is encoded once. For each budget, examples are split into
+stratified folds; the held-out fold is classified against centroids built
+from the category keywords plus an ExampleStore of the remaining examples.
+
+Usage:
+    python benchmark_example_budget.py [labelled.json] [--folds 5]
+
+The labelled file has the same layout as training_data.json.
+"""
+import sys
+import json
+import argparse
+import numpy as np
+from example_store import ExampleStore
+from sbert_classifier import SBERTQueryClassifier
+
+BUDGETS = [None, 200, 100, 50, 20, 10, 5, 3, 1, 0]
+
+
+def unit(vectors):
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def evaluate_budget(budget, keyword_vectors, example_texts, example_vectors, folds):
+    categories = list(keyword_vectors)
+    correct = total = 0
+    kept = []
+    for fold in range(folds):
+        centroids = []
+        for category in categories:
+            store = ExampleStore(budget)
+            train = [i for i in range(len(example_texts[category])) if i % folds != fold]
+            store.extend([example_texts[category][i] for i in train], example_vectors[category][train])
+            kept.append(len(store))
+            parts = [keyword_vectors[category]]
+            if len(store):
+                parts.append(store.embeddings)
+            centroids.append(np.vstack(parts).mean(axis=0))
+        centroids = unit(np.vstack(centroids))
+
+        for label, category in enumerate(categories):
+            test = [i for i in range(len(example_texts[category])) if i % folds == fold]
+            if not test:
+                continue
+            predictions = np.argmax(unit(example_vectors[category][test]) @ centroids.T, axis=1)
+            correct += int(np.sum(predictions == label))
+            total += len(test)
+    return correct / total * 100 if total else 0.0, float(np.mean(kept))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("data", nargs="?", default="training_data.json")
+    parser.add_argument("--folds", type=int, default=5)
+    args = parser.parse_args()
+
+    classifier = SBERTQueryClassifier()
+    if classifier.use_fallback:
+        print("SBERT model not available; nothing to benchmark")
+        sys.exit(1)
+
+    with open(args.data, 'r') as f:
+        labelled = json.load(f)
+
+    keyword_vectors = {}
+    example_texts = {}
+    example_vectors = {}
+    for category, data in classifier.categories.items():
+        keyword_vectors[category] = classifier.model.encode(list(data['keywords']), convert_to_numpy=True)
+        example_texts[category] = list(dict.fromkeys(labelled.get(category, [])))
+        if example_texts[category]:
+            example_vectors[category] = classifier.model.encode(example_texts[category], convert_to_numpy=True)
+        else:
+            example_vectors[category] = np.zeros((0, keyword_vectors[category].shape[1]), dtype=np.float32)
+
+    print(f"{'budget':>8} {'avg kept':>9} {'accuracy':>9}")
+    for budget in BUDGETS:
+        accuracy, kept = evaluate_budget(budget, keyword_vectors, example_texts, example_vectors, args.folds)
+        label = "none" if budget is None else str(budget)
+        print(f"{label:>8} {kept:9.1f} {accuracy:8.2f}%")
+
+
+if __name__ == "__main__":
+    main()
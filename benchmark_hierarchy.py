@@ -0,0 +1,86 @@
+"""
+Benchmark flat versus hierarchical (beam search) category scoring
+
+Uses a synthetic taxonomy of municipal bodies, departments and
+sub-departments with clustered random centroids, so no SBERT model is
+needed. Only the scoring step is timed; query encoding costs the same
+in both modes.
+"""
+import time
+import numpy as np
+from hierarchical_classifier import CategoryIndex, flatten_taxonomy, PATH_SEPARATOR
+
+DIM = 384
+BODIES = 10
+DEPARTMENTS = 8
+SUB_DEPARTMENTS = 8
+QUERIES = 2000
+BEAM_WIDTHS = [1, 2, 3, 5]
+
+
+def build_synthetic_index(rng):
+    taxonomy = {}
+    leaf_vectors = {}
+    for b in range(BODIES):
+        body_center = rng.normal(size=DIM)
+        departments = {}
+        for d in range(DEPARTMENTS):
+            dept_center = body_center + 0.6 * rng.normal(size=DIM)
+            subs = {}
+            for s in range(SUB_DEPARTMENTS):
+                name = f"sub_{s}"
+                subs[name] = {"keywords": [], "examples": []}
+                path = PATH_SEPARATOR.join([f"body_{b}", f"dept_{d}", name])
+                leaf_vectors[path] = dept_center + 0.4 * rng.normal(size=DIM)
+            departments[f"dept_{d}"] = {"children": subs}
+        taxonomy[f"body_{b}"] = {"children": departments}
+
+    _, _, tree = flatten_taxonomy(taxonomy)
+    return CategoryIndex(tree, leaf_vectors)
+
+
+def make_queries(index, rng):
+    picks = rng.integers(0, len(index.leaves), size=QUERIES)
+    queries = index.leaf_matrix[picks] + 0.05 * rng.normal(size=(QUERIES, DIM))
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return [index.leaves[i] for i in picks], queries.astype(np.float32)
+
+
+def time_queries(fn, queries):
+    latencies = []
+    predictions = []
+    for q in queries:
+        start = time.perf_counter()
+        scores = fn(q)
+        predictions.append(max(scores, key=scores.get))
+        latencies.append((time.perf_counter() - start) * 1e6)
+    return predictions, np.array(latencies)
+
+
+def report(name, labels, predictions, latencies):
+    accuracy = np.mean([p == l for p, l in zip(predictions, labels)]) * 100
+    print(f"{name:<28} mean {latencies.mean():8.1f}us  "
+          f"p95 {np.percentile(latencies, 95):8.1f}us  top-1 agreement {accuracy:6.2f}%")
+
+
+def main():
+    rng = np.random.default_rng(0)
+    index = build_synthetic_index(rng)
+    labels, queries = make_queries(index, rng)
+
+    print(f"Leaves: {len(index.leaves)}, dim: {DIM}, queries: {QUERIES}")
+    print("-" * 60)
+
+    # The per-category loop mirrors SBERTQueryClassifier._similarities()
+    centroids = {path: index.centroids[path] for path in index.leaves}
+    loop = lambda q: {path: float(np.dot(q, c)) for path, c in centroids.items()}
+    report("flat (per-category loop)", labels, *time_queries(loop, queries))
+    report("flat (single matmul)", labels, *time_queries(index.score_flat, queries))
+
+    for width in BEAM_WIDTHS:
+        search = lambda q: index.beam_search(q, width)[0]
+        report(f"hierarchical (beam={width})", labels, *time_queries(search, queries))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Compare per-instance category tables with the shared compiled taxonomy
+
+"Per-instance" rebuilds the category dicts for every classifier instance
+the way the classifier constructors used to, and scores a query by
+walking those dicts. "Shared" loads taxonomy.json once into a Taxonomy
+and scores with its precompiled KeywordMatcher. The categories_dict()
+line shows the mutable copy each SBERT classifier used to take of the
+shared taxonomy; classifiers now keep a reference instead.
+"""
+import copy
+import json
+import time
+import tracemalloc
+from taxonomy import TAXONOMY_PATH, Taxonomy, load_taxonomy
+
+INSTANCES = 100
+QUERIES = [
+    "Potholes on my street need repair",
+    "Sewer overflow in my neighborhood",
+    "Frequent power cuts in my area",
+    "Website of government portal is not loading",
+    "What is the status of my passport application?"
+]
+ROUNDS = 2000
+
+
+def per_instance_tables(raw, instances):
+    # SBERT and keyword classifiers each built the civic table,
+    # GovQueryClassifier built the departments table
+    return [
+        (copy.deepcopy(raw["civic"]), copy.deepcopy(raw["civic"]), copy.deepcopy(raw["departments"]))
+        for _ in range(instances)
+    ]
+
+
+def dict_scores(categories, query):
+    query_lower = query.lower()
+    scores = {}
+    for category, data in categories.items():
+        score = 0
+        for keyword in data['keywords']:
+            if keyword.lower() in query_lower:
+                score += 1
+        scores[category] = score
+    return scores
+
+
+def measure(label, build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<32} build {elapsed * 1000:8.2f}ms  memory {current / 1024:9.1f}KiB")
+    return result
+
+
+def main():
+    with open(TAXONOMY_PATH, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+
+    print(f"Instances: {INSTANCES} x 3 classifiers")
+    print("-" * 60)
+    tables = measure("per-instance tables", lambda: per_instance_tables(raw, INSTANCES))
+
+    load_taxonomy.cache_clear()
+
+    def shared():
+        civic, departments = load_taxonomy("civic"), load_taxonomy("departments")
+        return [(civic, civic, departments) for _ in range(INSTANCES)]
+    taxonomies = measure("shared taxonomy (incl. file read)", shared)
+
+    measure("one Taxonomy from parsed JSON", lambda: Taxonomy("civic", raw["civic"]))
+    civic = taxonomies[0][0]
+    measure("categories_dict() per instance", lambda: [civic.categories_dict() for _ in range(INSTANCES)])
+
+    print("-" * 60)
+    civic_dict = tables[0][0]
+    matcher = taxonomies[0][0].keyword_matcher
+    lowered = [query.lower() for query in QUERIES]
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for query in QUERIES:
+            dict_scores(civic_dict, query)
+    dict_us = (time.perf_counter() - start) / (ROUNDS * len(QUERIES)) * 1e6
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        for query in lowered:
+            matcher.scores(query)
+    matcher_us = (time.perf_counter() - start) / (ROUNDS * len(QUERIES)) * 1e6
+
+    print(f"{'keyword scoring, dict walk':<32} {dict_us:8.2f}us/query")
+    print(f"{'keyword scoring, KeywordMatcher':<32} {matcher_us:8.2f}us/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+import re
+import time
+import zlib
+import threading
+from collections import deque, Counter
+from itertools import chain, islice
+import numpy as np
+
+MERSENNE_PRIME = (1 << 61) - 1
+NON_WORD = re.compile(r"[^a-z0-9]+")
+DIGIT = re.compile(r"[0-9]")
+
+
+class _Entry:
+    __slots__ = ('timestamp', 'cluster_id', 'tokens')
+
+    def __init__(self, timestamp, cluster_id, tokens):
+        self.timestamp = timestamp
+        self.cluster_id = cluster_id
+        self.tokens = tokens
+
+
+class _Cluster:
+    """
+    Size of a cluster and the query that founded it; later queries are
+    always compared with the founder, so clusters cannot drift or chain
+    """
+    __slots__ = ('size', 'signature', 'band_keys', 'tokens', 'numbers')
+
+    def __init__(self, signature, band_keys, tokens, numbers):
+        self.size = 0
+        self.signature = signature
+        self.band_keys = band_keys
+        self.tokens = tokens
+        self.numbers = numbers
+
+
+class _RecentClusters:
+    """
+    Fixed-size ring of cluster representative embeddings for one category
+    """
+    def __init__(self, capacity, dim):
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.cluster_ids = np.full(capacity, -1, dtype=np.int64)
+        self.timestamps = np.full(capacity, -np.inf)
+        self.position = 0
+
+    def add(self, cluster_id, vector, timestamp):
+        self.vectors[self.position] = vector
+        self.cluster_ids[self.position] = cluster_id
+        self.timestamps[self.position] = timestamp
+        self.position = (self.position + 1) % len(self.vectors)
+
+    def best_match(self, vector, since):
+        sims = self.vectors @ vector
+        sims[self.timestamps < since] = -np.inf
+        best = int(np.argmax(sims))
+        return int(self.cluster_ids[best]), float(sims[best])
+
+
+class ComplaintClusterer:
+    """
+    Online grouping of near-duplicate complaints within a sliding time window
+
+    Each query is shingled into character n-grams and MinHashed. The LSH
+    index holds the signature of each active cluster's founding query, and
+    banding finds the clusters whose founders probably agree with the
+    query. Every candidate is verified against its founder, not against
+    whichever member happened to match: the MinHash estimate must reach
+    jaccard_threshold, the numbers in both texts (sector, house and road
+    numbers) must be the same, and the token overlap, with every token
+    weighted by the inverse of how many queries in the window contain it,
+    must reach token_threshold. Rare words such as locality names therefore
+    decide the match, while common complaint wording barely counts.
+    Queries without a textual match can still join a recent cluster of the
+    same category whose founder embedding is within embedding_threshold
+    cosine similarity, if the numbers agree and the weighted token overlap
+    reaches embedding_token_threshold. Entries older than window_seconds,
+    or beyond max_entries, are evicted oldest first, so memory stays
+    bounded however long the stream runs.
+    """
+    def __init__(self, num_perm=64, bands=32, shingle_size=5, jaccard_threshold=0.3,
+                 token_threshold=0.6, embedding_threshold=0.9, embedding_token_threshold=0.3,
+                 window_seconds=3600, max_entries=50000, recent_clusters=512, max_candidates=256,
+                 max_verified=32, seed=1):
+        """
+        Initialize the clusterer
+
+        Args:
+            num_perm (int): MinHash signature length
+            bands (int): LSH bands; num_perm must be divisible by it
+            shingle_size (int): Character n-gram length
+            jaccard_threshold (float): Estimated character-shingle Jaccard
+                similarity to a cluster's founder needed to consider joining it
+            token_threshold (float): Rarity-weighted token Jaccard similarity
+                to the founder needed to join through text
+            embedding_threshold (float): Cosine similarity needed to join a
+                cluster through its embedding
+            embedding_token_threshold (float): Rarity-weighted token Jaccard
+                similarity needed to join through the embedding
+            window_seconds (float): How long a query stays matchable
+            max_entries (int): Hard cap on remembered queries
+            recent_clusters (int): Cluster embeddings kept per category and
+                embedding size
+            max_candidates (int): Most recent clusters taken from each LSH bucket
+            max_verified (int): Candidate clusters whose founders are compared
+            seed (int): Seed for the MinHash permutations
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 31, size=(num_perm, 1), dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 31, size=(num_perm, 1), dtype=np.uint64)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.jaccard_threshold = jaccard_threshold
+        self.token_threshold = token_threshold
+        self.embedding_threshold = embedding_threshold
+        self.embedding_token_threshold = embedding_token_threshold
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self.recent_clusters = recent_clusters
+        self.max_candidates = max_candidates
+        self.max_verified = max_verified
+
+        self._entries = deque()
+        self._buckets = {}
+        self._clusters = {}
+        self._document_frequency = {}
+        self._recent = {}
+        self._next_cluster = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(text):
+        return NON_WORD.sub(" ", text.lower()).strip()
+
+    def _shingle_hashes(self, text):
+        text = self._normalize(text)
+        n = self.shingle_size
+        if len(text) <= n:
+            shingles = {text}
+        else:
+            shingles = {text[i:i + n] for i in range(len(text) - n + 1)}
+        return np.fromiter(
+            (zlib.crc32(s.encode('utf-8')) for s in shingles), dtype=np.uint64, count=len(shingles)
+        )
+
+    def signature(self, text):
+        """
+        MinHash signature of a text
+
+        Args:
+            text (str): The text to sign
+
+        Returns:
+            np.ndarray: num_perm uint64 values
+        """
+        hashes = self._shingle_hashes(text)
+        return ((self._a * hashes + self._b) % MERSENNE_PRIME).min(axis=1)
+
+    def _band_keys(self, signature, scope=None):
+        rows = self.rows
+        return [
+            (scope, band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.bands)
+        ]
+
+    def _evict(self, now):
+        horizon = now - self.window_seconds
+        while self._entries and (self._entries[0].timestamp < horizon
+                                 or len(self._entries) > self.max_entries):
+            entry = self._entries.popleft()
+            for token in entry.tokens:
+                remaining = self._document_frequency[token] - 1
+                if remaining:
+                    self._document_frequency[token] = remaining
+                else:
+                    del self._document_frequency[token]
+            cluster = self._clusters[entry.cluster_id]
+            cluster.size -= 1
+            if not cluster.size:
+                del self._clusters[entry.cluster_id]
+                for key in cluster.band_keys:
+                    bucket = self._buckets[key]
+                    del bucket[entry.cluster_id]
+                    if not bucket:
+                        del self._buckets[key]
+
+    def _token_similarity(self, tokens, other):
+        # Jaccard similarity with each token weighted by 1 / (queries in the
+        # window containing it + 1)
+        frequency = self._document_frequency
+        shared = sum(1 / (frequency.get(token, 0) + 1) for token in tokens & other)
+        union = sum(1 / (frequency.get(token, 0) + 1) for token in tokens | other)
+        return shared / union if union else 1.0
+
+    def _text_match(self, signature, band_keys, tokens, numbers):
+        buckets = self._buckets
+        votes = Counter(chain.from_iterable(
+            islice(reversed(buckets[key]), self.max_candidates) for key in band_keys if key in buckets
+        ))
+        if not votes:
+            return None
+        # Clusters sharing more bands are the likeliest matches; only their
+        # founders are verified
+        candidates = [cluster_id for cluster_id, _ in votes.most_common(self.max_verified)]
+        clusters = [self._clusters[cluster_id] for cluster_id in candidates]
+        signatures = np.vstack([cluster.signature for cluster in clusters])
+        estimates = np.mean(signatures == signature, axis=1)
+
+        best, best_similarity = None, self.token_threshold
+        for cluster_id, cluster, estimate in zip(candidates, clusters, estimates):
+            if estimate < self.jaccard_threshold or cluster.numbers != numbers:
+                continue
+            similarity = self._token_similarity(tokens, cluster.tokens)
+            if similarity >= best_similarity:
+                best, best_similarity = cluster_id, similarity
+        return best
+
+    def assign(self, text, category=None, embedding=None, now=None, scope=None):
+        """
+        Assign a query to a cluster, creating a new one if nothing matches
+
+        Args:
+            text (str): The query text
+            category (str): Predicted category, used to scope embedding matches
+            embedding (np.ndarray): Optional query embedding
+            now (float): Timestamp in seconds; defaults to time.time()
+            scope (str): Optional namespace, e.g. a tenant id; queries only
+                join clusters of the same scope
+
+        Returns:
+            dict: 'cluster_id' and 'cluster_size' (queries in the window)
+        """
+        now = time.time() if now is None else now
+        signature = self.signature(text)
+        band_keys = self._band_keys(signature, scope)
+        tokens = frozenset(self._normalize(text).split())
+        numbers = frozenset(token for token in tokens if DIGIT.search(token))
+        unit = None
+        if embedding is not None:
+            unit = np.asarray(embedding, dtype=np.float32).ravel()
+            norm = np.linalg.norm(unit)
+            unit = unit / norm if norm > 0 else None
+
+        with self._lock:
+            self._evict(now)
+            cluster_id = self._text_match(signature, band_keys, tokens, numbers)
+
+            # Keyed by dimension too, so a reload to an encoder of another
+            # size starts fresh rings instead of failing the matmul
+            recent_key = (scope, category, len(unit)) if unit is not None else None
+            recent = self._recent.get(recent_key)
+            if cluster_id is None and unit is not None and recent is not None:
+                candidate, similarity = recent.best_match(unit, now - self.window_seconds)
+                cluster = self._clusters.get(candidate)
+                if (similarity >= self.embedding_threshold and cluster is not None
+                        and cluster.numbers == numbers
+                        and self._token_similarity(tokens, cluster.tokens) >= self.embedding_token_threshold):
+                    cluster_id = candidate
+
+            if cluster_id is None:
+                cluster_id = self._next_cluster
+                self._next_cluster += 1
+                self._clusters[cluster_id] = _Cluster(signature, band_keys, tokens, numbers)
+                for key in band_keys:
+                    # Dicts keep insertion order, so the newest cluster is last
+                    self._buckets.setdefault(key, {})[cluster_id] = None
+                if unit is not None:
+                    if recent is None:
+                        # Rings of the previous encoder are not matched again
+                        for key in [key for key in self._recent if key[:2] == (scope, category)]:
+                            del self._recent[key]
+                        recent = self._recent[recent_key] = _RecentClusters(self.recent_clusters, len(unit))
+                    recent.add(cluster_id, unit, now)
+
+            self._entries.append(_Entry(now, cluster_id, tokens))
+            for token in tokens:
+                self._document_frequency[token] = self._document_frequency.get(token, 0) + 1
+            cluster = self._clusters[cluster_id]
+            cluster.size += 1
+            return {"cluster_id": cluster_id, "cluster_size": cluster.size}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "active_clusters": len(self._clusters),
+                "buckets": len(self._buckets),
+                "window_seconds": self.window_seconds
+            }
@@ -0,0 +1,351 @@
+"""
+k-fold cross-validation of the classifiers on labelled queries
+
+Every text is encoded once (and cached on disk per SBERT model); each fold
+then only rebuilds the example stores and category centroids from the
+cached vectors with numpy. Folds run in parallel worker processes, which
+receive the texts and vectors once when they start rather than with every
+fold. For every classifier the script prints accuracy, macro F1,
+per-category precision/recall/F1, a confusion matrix and single-query
+latency of the live classify_query().
+
+Usage:
+    python evaluate.py [labelled.json] [--folds 5] [--jobs 4]
+                       [--classifiers sbert,keyword] [--json results.json]
+
+The labelled file has the same layout as training_data.json.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from example_store import ExampleStore
+from taxonomy import load_taxonomy
+
+CACHE_DIR = ".eval_cache"
+CLASSIFIERS = ("sbert", "keyword")
+
+# Set in each worker process by _share_fold_data()
+_fold_data = None
+
+
+def load_labelled(path):
+    """
+    Load labelled queries, dropping repeats within a category
+
+    Args:
+        path (str): JSON file mapping category to a list of queries
+
+    Returns:
+        tuple: (texts, labels) lists of equal length
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    texts, labels = [], []
+    for category, examples in data.items():
+        for example in dict.fromkeys(examples):
+            texts.append(example)
+            labels.append(category)
+    return texts, labels
+
+
+def encode_cached(model, model_name, texts, cache_dir=CACHE_DIR):
+    """
+    Encode texts, reusing vectors cached by earlier runs with the same model
+
+    Args:
+        model: SentenceTransformer used for texts missing from the cache
+        model_name (str): Name of the model, used as the cache file name
+        texts (list): Texts to encode
+        cache_dir (str): Directory of the embedding cache
+
+    Returns:
+        np.ndarray: One row per text
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, model_name.replace("/", "_") + ".npz")
+    cache = {}
+    if os.path.exists(path):
+        stored = np.load(path)
+        cache = dict(zip(stored["keys"].tolist(), stored["vectors"]))
+
+    keys = [hashlib.sha1(text.encode('utf-8')).hexdigest() for text in texts]
+    missing = [i for i, key in enumerate(keys) if key not in cache]
+    if missing:
+        vectors = model.encode([texts[i] for i in missing], convert_to_numpy=True, batch_size=64)
+        for i, vector in zip(missing, vectors):
+            cache[keys[i]] = vector
+        np.savez(path, keys=np.array(list(cache.keys())), vectors=np.vstack(list(cache.values())))
+    return np.vstack([cache[key] for key in keys]).astype(np.float32)
+
+
+def stratified_folds(labels, folds, seed=0):
+    """
+    Assign every example to a fold, spreading each category evenly
+
+    Args:
+        labels (list): Category of each example
+        folds (int): Number of folds
+        seed (int): Shuffle seed
+
+    Returns:
+        np.ndarray: Fold number of each example
+    """
+    rng = np.random.default_rng(seed)
+    assignment = np.zeros(len(labels), dtype=np.int64)
+    labels = np.array(labels)
+    for category in np.unique(labels):
+        members = np.flatnonzero(labels == category)
+        rng.shuffle(members)
+        assignment[members] = np.arange(len(members)) % folds
+    return assignment
+
+
+def _unit(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+def _share_fold_data(data):
+    # Pool initializer: keep the texts and vectors of all folds in the worker
+    global _fold_data
+    _fold_data = data
+
+
+def sbert_fold(fold):
+    """
+    Centroid classification of one fold, mirroring SBERTQueryClassifier.train()
+
+    The taxonomy's built-in examples and then the training-fold examples of
+    each category go through an ExampleStore with the classifier's budget
+    and near-duplicate threshold, and each centroid is the mean of the
+    category's keyword embeddings and the stored example embeddings.
+    Built-in examples that are also test queries of the fold are left out.
+    The data is set by _share_fold_data().
+
+    Args:
+        fold (int): Fold to test on
+
+    Returns:
+        tuple: (test indices, predicted label ids, scoring seconds)
+    """
+    data = _fold_data
+    texts, vectors, label_ids, keyword_vectors, keyword_ids = (
+        data["texts"], data["vectors"], data["label_ids"], data["keyword_vectors"], data["keyword_ids"]
+    )
+    builtin_texts, builtin_vectors, builtin_ids = (
+        data["builtin_texts"], data["builtin_vectors"], data["builtin_ids"]
+    )
+    test_mask = data["folds"] == fold
+    held_out = {texts[i] for i in np.flatnonzero(test_mask)}
+    centroids = np.zeros((data["n_categories"], vectors.shape[1]), dtype=np.float64)
+    for category in range(data["n_categories"]):
+        store = ExampleStore(data["example_budget"], data["duplicate_threshold"])
+        # Built-in examples come first, as in train(); repeats are skipped
+        # like Taxonomy.with_examples() does
+        builtin = [j for j in np.flatnonzero(builtin_ids == category) if builtin_texts[j] not in held_out]
+        store.extend([builtin_texts[j] for j in builtin], builtin_vectors[builtin])
+        known = {builtin_texts[j] for j in builtin}
+        members = [i for i in np.flatnonzero((label_ids == category) & ~test_mask) if texts[i] not in known]
+        store.extend([texts[i] for i in members], vectors[members])
+        parts = [keyword_vectors[keyword_ids == category]]
+        if len(store):
+            parts.append(store.embeddings)
+        embeddings = np.vstack(parts)
+        if len(embeddings):
+            centroids[category] = embeddings.mean(axis=0)
+    centroids = _unit(centroids)
+
+    test = np.flatnonzero(test_mask)
+    start = time.perf_counter()
+    predictions = np.argmax(_unit(vectors[test]) @ centroids.T, axis=1)
+    return test, predictions, time.perf_counter() - start
+
+
+def keyword_fold(fold):
+    """
+    Keyword classification of one fold; nothing is learned from the
+    training part, but folds keep the report comparable with sbert. The
+    data is set by _share_fold_data().
+
+    Args:
+        fold (int): Fold to test on
+
+    Returns:
+        tuple: (test indices, predicted label ids, classification seconds)
+    """
+    from keyword_classifier import KeywordQueryClassifier
+    data = _fold_data
+    texts, names = data["texts"], data["names"]
+    test = np.flatnonzero(data["folds"] == fold)
+    classifier = KeywordQueryClassifier()
+    index = {name: i for i, name in enumerate(names)}
+    start = time.perf_counter()
+    predictions = [index.get(classifier.classify_query(texts[i]), len(names)) for i in test]
+    return test, np.array(predictions, dtype=np.int64), time.perf_counter() - start
+
+
+def report(names, label_ids, predictions):
+    """
+    Confusion matrix and per-category precision, recall and F1
+
+    Args:
+        names (list): Category names; id len(names) means 'unknown'
+        label_ids (np.ndarray): True label ids
+        predictions (np.ndarray): Predicted label ids
+
+    Returns:
+        dict: 'accuracy', 'macro_f1', 'per_category' and 'confusion'
+            (rows are true categories, columns predictions incl. unknown)
+    """
+    n = len(names)
+    confusion = np.zeros((n, n + 1), dtype=np.int64)
+    np.add.at(confusion, (label_ids, predictions), 1)
+
+    per_category = {}
+    for i, name in enumerate(names):
+        tp = confusion[i, i]
+        predicted = confusion[:, i].sum()
+        actual = confusion[i].sum()
+        precision = tp / predicted if predicted else 0.0
+        recall = tp / actual if actual else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        per_category[name] = {
+            "precision": float(precision), "recall": float(recall), "f1": float(f1), "support": int(actual)
+        }
+    return {
+        "accuracy": float(np.trace(confusion[:, :n]) / max(1, confusion.sum())),
+        "macro_f1": float(np.mean([m["f1"] for m in per_category.values()])),
+        "per_category": per_category,
+        "confusion": confusion.tolist()
+    }
+
+
+def measure_latency(classifier, texts, sample):
+    """
+    Single-query latency of classify_query() on the first sample texts
+
+    Returns:
+        dict: Mean and p95 latency in milliseconds
+    """
+    latencies = []
+    for text in texts[:sample]:
+        start = time.perf_counter()
+        classifier.classify_query(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {"mean_ms": float(np.mean(latencies)), "p95_ms": float(np.percentile(latencies, 95))}
+
+
+def print_report(name, result, names):
+    print(f"\n=== {name} ===")
+    print(f"accuracy {result['accuracy'] * 100:.2f}%  macro F1 {result['macro_f1']:.3f}  "
+          f"latency mean {result['latency']['mean_ms']:.2f}ms p95 {result['latency']['p95_ms']:.2f}ms")
+    print(f"{'category':<24}{'precision':>10}{'recall':>8}{'f1':>8}{'n':>6}")
+    for category, metrics in result["per_category"].items():
+        print(f"{category:<24}{metrics['precision']:>10.3f}{metrics['recall']:>8.3f}"
+              f"{metrics['f1']:>8.3f}{metrics['support']:>6}")
+    print("confusion (rows: true, columns: predicted, last column: unknown)")
+    short = [category[:6] for category in names] + ["unk"]
+    print(" " * 24 + "".join(f"{label:>7}" for label in short))
+    for category, row in zip(names, result["confusion"]):
+        print(f"{category:<24}" + "".join(f"{count:>7}" for count in row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-validate the query classifiers")
+    parser.add_argument("data", nargs="?", default="training_data.json")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--classifiers", default=",".join(CLASSIFIERS))
+    parser.add_argument("--latency-sample", type=int, default=200)
+    parser.add_argument("--json", help="Also write the full results to this file")
+    args = parser.parse_args()
+
+    texts, labels = load_labelled(args.data)
+    taxonomy = load_taxonomy("civic")
+    names = list(taxonomy.names)
+    unknown = sorted(set(labels) - set(names))
+    if unknown:
+        print(f"Dropping examples of categories not in the taxonomy: {unknown}")
+        kept = [i for i, label in enumerate(labels) if label in taxonomy]
+        texts = [texts[i] for i in kept]
+        labels = [labels[i] for i in kept]
+    label_ids = np.array([taxonomy.index[label] for label in labels])
+    folds = stratified_folds(labels, args.folds)
+    print(f"{len(texts)} examples, {len(names)} categories, {args.folds} folds, {args.jobs} workers")
+
+    results = {}
+    for name in args.classifiers.split(","):
+        if name == "sbert":
+            from sbert_classifier import SBERTQueryClassifier
+            classifier = SBERTQueryClassifier(taxonomy=taxonomy)
+            if classifier.use_fallback:
+                print("SBERT model not available; skipping sbert")
+                continue
+            start = time.perf_counter()
+            vectors = encode_cached(classifier.model, classifier.model_name, texts)
+            keyword_texts = [k for keywords in taxonomy.keywords for k in keywords]
+            keyword_ids = np.array([i for i, keywords in enumerate(taxonomy.keywords) for _ in keywords])
+            keyword_vectors = encode_cached(classifier.model, classifier.model_name, keyword_texts)
+            builtin_texts = [e for examples in taxonomy.examples for e in examples]
+            builtin_ids = np.array([i for i, examples in enumerate(taxonomy.examples) for _ in examples])
+            builtin_vectors = encode_cached(classifier.model, classifier.model_name, builtin_texts)
+            print(f"Encoded/loaded embeddings in {time.perf_counter() - start:.2f}s")
+            data = {
+                "texts": texts,
+                "vectors": vectors,
+                "label_ids": label_ids,
+                "folds": folds,
+                "keyword_vectors": keyword_vectors,
+                "keyword_ids": keyword_ids,
+                "builtin_texts": builtin_texts,
+                "builtin_vectors": builtin_vectors,
+                "builtin_ids": builtin_ids,
+                "n_categories": len(names),
+                "example_budget": classifier.example_budget,
+                "duplicate_threshold": classifier.duplicate_threshold
+            }
+            with ProcessPoolExecutor(max_workers=args.jobs, initializer=_share_fold_data,
+                                     initargs=(data,)) as pool:
+                fold_results = list(pool.map(sbert_fold, range(args.folds)))
+
+            examples = {}
+            for text, label in zip(texts, labels):
+                examples.setdefault(label, []).append(text)
+            trained = SBERTQueryClassifier(taxonomy=taxonomy.with_examples(examples))
+            with tempfile.TemporaryDirectory() as tmp:
+                trained.train(save_path=tmp)
+            latency = measure_latency(trained, texts, args.latency_sample)
+        elif name == "keyword":
+            from keyword_classifier import KeywordQueryClassifier
+            data = {"texts": texts, "folds": folds, "names": names}
+            with ProcessPoolExecutor(max_workers=args.jobs, initializer=_share_fold_data,
+                                     initargs=(data,)) as pool:
+                fold_results = list(pool.map(keyword_fold, range(args.folds)))
+            latency = measure_latency(KeywordQueryClassifier(taxonomy), texts, args.latency_sample)
+        else:
+            print(f"Unknown classifier '{name}'; choose from {', '.join(CLASSIFIERS)}")
+            continue
+
+        predictions = np.empty(len(texts), dtype=np.int64)
+        for test, predicted, _ in fold_results:
+            predictions[test] = predicted
+        result = report(names, label_ids, predictions)
+        result["latency"] = latency
+        result["fold_scoring_seconds"] = sum(seconds for _, _, seconds in fold_results)
+        results[name] = result
+        print_report(name, result, names)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0 if results else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
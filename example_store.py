@@ -0,0 +1,154 @@
+import numpy as np
+
+
+def _unit(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+def select_coreset(embeddings, k):
+    """
+    Pick k representative rows with greedy k-center (farthest-first) selection
+
+    Starts from the point closest to the mean and repeatedly adds the point
+    farthest from everything selected so far, so the subset covers the
+    spread of the data rather than its densest region.
+
+    Args:
+        embeddings (np.ndarray): Matrix of shape (n, dim)
+        k (int): Number of rows to keep
+
+    Returns:
+        list: Sorted indices of the selected rows
+    """
+    n = len(embeddings)
+    if k >= n:
+        return list(range(n))
+    if k <= 0:
+        return []
+
+    unit = _unit(np.asarray(embeddings, dtype=np.float32))
+    first = int(np.argmax(unit @ _unit(unit.mean(axis=0))))
+    selected = [first]
+    # Cosine distance from every point to its closest selected point
+    distance = 1 - unit @ unit[first]
+    distance[first] = -np.inf
+    for _ in range(k - 1):
+        nxt = int(np.argmax(distance))
+        selected.append(nxt)
+        distance = np.minimum(distance, 1 - unit @ unit[nxt])
+        distance[selected] = -np.inf
+    return sorted(selected)
+
+
+class ExampleStore:
+    """
+    Bounded, near-duplicate free set of example texts for one category
+
+    New examples that are nearly identical to a stored one are dropped.
+    When the budget is exceeded the most redundant example (the one closest
+    to its nearest neighbour) is evicted, which keeps the store close to a
+    k-center coreset as examples arrive one at a time.
+    """
+    def __init__(self, budget=200, duplicate_threshold=0.95):
+        """
+        Initialize an empty store
+
+        Args:
+            budget (int): Maximum number of examples kept; None for no limit
+            duplicate_threshold (float): Cosine similarity above which a new
+                example counts as a near-duplicate
+        """
+        self.budget = budget
+        self.duplicate_threshold = duplicate_threshold
+        self.texts = []
+        self.embeddings = None
+        self._unit = None
+
+    def __len__(self):
+        return len(self.texts)
+
+    def _is_duplicate(self, text, unit):
+        if text in self.texts:
+            return True
+        if self._unit is None or not len(self._unit):
+            return False
+        return float(np.max(self._unit @ unit)) >= self.duplicate_threshold
+
+    def _keep(self, indices):
+        self.texts = [self.texts[i] for i in indices]
+        self.embeddings = self.embeddings[indices]
+        self._unit = self._unit[indices]
+
+    def restore(self, texts, embeddings):
+        """
+        Replace the contents with previously stored examples as-is
+
+        Args:
+            texts (list): Example texts
+            embeddings (np.ndarray): Matrix of their embeddings
+        """
+        self.texts = list(texts)
+        self.embeddings = np.asarray(embeddings, dtype=np.float32)
+        self._unit = _unit(self.embeddings)
+
+    def add(self, text, embedding):
+        """
+        Add one example, evicting the most redundant one if over budget
+
+        Args:
+            text (str): The example text
+            embedding (np.ndarray): Its SBERT embedding
+
+        Returns:
+            bool: False if the example was rejected as a near-duplicate
+        """
+        embedding = np.asarray(embedding, dtype=np.float32)
+        unit = _unit(embedding)
+        if self._is_duplicate(text, unit):
+            return False
+
+        self.texts.append(text)
+        if self.embeddings is None:
+            self.embeddings = embedding[np.newaxis, :]
+            self._unit = unit[np.newaxis, :]
+        else:
+            self.embeddings = np.vstack([self.embeddings, embedding])
+            self._unit = np.vstack([self._unit, unit])
+
+        if self.budget is not None and len(self.texts) > self.budget:
+            sims = self._unit @ self._unit.T
+            np.fill_diagonal(sims, -np.inf)
+            redundant = int(np.argmax(sims.max(axis=1)))
+            self._keep([i for i in range(len(self.texts)) if i != redundant])
+        return True
+
+    def extend(self, texts, embeddings):
+        """
+        Add many examples at once, compacting with k-center selection
+
+        Args:
+            texts (list): Example texts
+            embeddings (np.ndarray): Matrix of their embeddings
+
+        Returns:
+            int: Number of examples kept from the batch before compaction
+        """
+        budget, self.budget = self.budget, None
+        try:
+            accepted = sum(self.add(text, embedding) for text, embedding in zip(texts, embeddings))
+        finally:
+            self.budget = budget
+        self.set_budget(budget)
+        return accepted
+
+    def set_budget(self, budget):
+        """
+        Change the budget, shrinking the store to a coreset if needed
+
+        Args:
+            budget (int): New maximum number of examples; None for no limit
+        """
+        self.budget = budget
+        if budget is not None and len(self.texts) > budget:
+            self._keep(select_coreset(self.embeddings, budget))
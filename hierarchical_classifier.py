@@ -0,0 +1,396 @@
+import os
+import pickle
+import numpy as np
+from sbert_classifier import SBERTQueryClassifier
+from taxonomy import KeywordMatcher, load_taxonomy
+
+PATH_SEPARATOR = "/"
+ROOT = ""
+
+
+def flatten_taxonomy(taxonomy, prefix=ROOT):
+    """
+    Walk a nested taxonomy and collect its leaves and parent/child links
+
+    A node is a dict with optional 'keywords', 'examples' and 'children'.
+    Nodes without children are leaves. The flat category dict used by
+    SBERTQueryClassifier is a taxonomy with a single level.
+
+    Args:
+        taxonomy (dict): Mapping of node name to node dict
+        prefix (str): Path of the parent node
+
+    Returns:
+        tuple: (leaves, nodes, tree) where leaves maps leaf path to its node
+            dict, nodes maps every path to its node dict and tree maps a
+            parent path to the list of its child paths
+    """
+    leaves, nodes, tree = {}, {}, {prefix: []}
+    for name, node in taxonomy.items():
+        path = prefix + PATH_SEPARATOR + name if prefix else name
+        tree[prefix].append(path)
+        nodes[path] = node
+        if node.get('children'):
+            sub_leaves, sub_nodes, sub_tree = flatten_taxonomy(node['children'], path)
+            leaves.update(sub_leaves)
+            nodes.update(sub_nodes)
+            tree.update(sub_tree)
+        else:
+            leaves[path] = node
+    return leaves, nodes, tree
+
+
+def _normalize(vector):
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class CategoryIndex:
+    """
+    Per-level centroid matrices for coarse-to-fine scoring
+
+    Every internal node keeps one matrix holding the normalized centroids of
+    its children, so a query only has to be compared against the children of
+    the nodes still in the beam instead of against every leaf. Leaves without
+    a (finite) vector, and internal nodes left without scoreable children,
+    are not indexed.
+    """
+    def __init__(self, tree, leaf_vectors, node_vectors=None):
+        """
+        Build the index
+
+        Args:
+            tree (dict): Parent path to child paths, from flatten_taxonomy()
+            leaf_vectors (dict): Leaf path to centroid vector
+            node_vectors (dict): Optional internal node path to a vector
+                built from the node's own keywords and examples
+        """
+        node_vectors = node_vectors or {}
+        self.tree = tree
+        self.centroids = {}
+        self._centroid(ROOT, leaf_vectors, node_vectors)
+
+        self.children = {}
+        for parent, child_paths in tree.items():
+            child_paths = [c for c in child_paths if c in self.centroids]
+            if child_paths:
+                matrix = np.vstack([self.centroids[c] for c in child_paths])
+                self.children[parent] = (tuple(child_paths), matrix)
+
+        self.leaves = tuple(path for path in leaf_vectors if path in self.centroids)
+        if not self.leaves:
+            raise ValueError("No category has keywords or examples to build a centroid from")
+        self.leaf_matrix = np.vstack([self.centroids[path] for path in self.leaves])
+
+    def _centroid(self, path, leaf_vectors, node_vectors):
+        if path in leaf_vectors:
+            vector = np.asarray(leaf_vectors[path], dtype=np.float32)
+            if not np.all(np.isfinite(vector)):
+                return None
+            centroid = _normalize(vector)
+        else:
+            parts = [self._centroid(c, leaf_vectors, node_vectors) for c in self.tree.get(path, ())]
+            parts = [part for part in parts if part is not None]
+            if not parts:
+                return None
+            if path in node_vectors:
+                parts.append(_normalize(np.asarray(node_vectors[path], dtype=np.float32)))
+            centroid = _normalize(np.mean(parts, axis=0))
+        if path != ROOT:
+            self.centroids[path] = centroid
+        return centroid
+
+    def is_leaf(self, path):
+        return path not in self.children
+
+    def score_flat(self, query_vector):
+        """
+        Score a normalized query against every leaf at once
+
+        Args:
+            query_vector (np.ndarray): Normalized query embedding
+
+        Returns:
+            dict: Cosine similarity for each leaf
+        """
+        sims = self.leaf_matrix @ query_vector
+        return dict(zip(self.leaves, sims.tolist()))
+
+    def beam_search(self, query_vector, beam_width=3):
+        """
+        Descend the tree keeping the best beam_width nodes at each level
+
+        Args:
+            query_vector (np.ndarray): Normalized query embedding
+            beam_width (int): Number of nodes kept per level
+
+        Returns:
+            tuple: (scores, confidence) where scores maps each leaf scored in
+                the final step to its similarity, and confidence maps every
+                scored node to its share among its siblings (in percent)
+        """
+        beam = [(ROOT, 0.0)]
+        confidence = {}
+        scores = {}
+        while any(not self.is_leaf(path) for path, _ in beam):
+            scores = {}
+            for path, sim in beam:
+                if self.is_leaf(path):
+                    scores[path] = sim
+                    continue
+                child_paths, matrix = self.children[path]
+                sims = (matrix @ query_vector).tolist()
+                total = sum(max(0, s) for s in sims)
+                for child, s in zip(child_paths, sims):
+                    scores[child] = s
+                    confidence[child] = (max(0, s) / total) * 100 if total > 0 else 0
+            beam = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:beam_width]
+
+        leaf_scores = {path: s for path, s in scores.items() if self.is_leaf(path)}
+        return leaf_scores, confidence
+
+
+class HierarchicalQueryClassifier(SBERTQueryClassifier):
+    def __init__(self, taxonomy=None, model_name='paraphrase-MiniLM-L6-v2', beam_width=3):
+        """
+        Initialize a classifier over a tree of categories
+
+        Args:
+            taxonomy (dict): Nested categories; each node has 'keywords',
+                'examples' and optionally 'children'. Defaults to the flat
+                SBERT categories, i.e. a one-level tree.
+            model_name (str): Name of the pre-trained SBERT model to use
+            beam_width (int): Number of nodes kept per level during search
+        """
+        super().__init__(model_name)
+        # Unlike the flat classifier's Taxonomy, the tree is a mutable nested
+        # dict, so it gets its own attribute
+        self.tree_spec = taxonomy if taxonomy is not None else self.taxonomy.categories_dict()
+        self.beam_width = beam_width
+
+        # Leaves keep pointing at the tree's own dicts, so the keyword
+        # fallback and add_training_example() work on leaf paths unchanged.
+        self._leaves, self.nodes, self.tree = flatten_taxonomy(self.tree_spec)
+        self._matcher = None
+        self.leaf_vectors = {}
+        self.node_vectors = {}
+        self.keyword_vectors = {}
+        self.index = None
+
+    def __setstate__(self, state):
+        # Instances pickled before the flat classifier held a Taxonomy
+        # stored their leaves as 'categories'
+        if 'categories' in state:
+            state['_leaves'] = state.pop('categories')
+        # ...and those pickled before tree_spec kept the tree as 'taxonomy'
+        if isinstance(state.get('taxonomy'), dict):
+            state['tree_spec'] = state.pop('taxonomy')
+        super().__setstate__(state)
+        if not hasattr(self, 'taxonomy'):
+            self.taxonomy = load_taxonomy("civic")
+
+    @property
+    def categories(self):
+        """Leaf path mapped to its node dict"""
+        return self._leaves
+
+    def _examples(self, category):
+        store = self.example_stores.get(category)
+        if store is not None:
+            return list(store.texts)
+        return list(self._leaves[category].get('examples', []))
+
+    def _keyword_matcher(self):
+        # Built on first use and again after load() replaces the tree
+        if getattr(self, '_matcher', None) is None:
+            self._matcher = KeywordMatcher(
+                self._leaves.keys(), [data.get('keywords', []) for data in self._leaves.values()]
+            )
+        return self._matcher
+
+    def _append_example(self, category, query):
+        examples = self._trimmed_examples(self._examples(category), query)
+        if examples is None:
+            return False
+        self._leaves[category]['examples'] = examples
+        return True
+
+    def _encode_texts(self, texts):
+        vectors = self.model.encode(list(texts), convert_to_numpy=True)
+        return np.mean(vectors, axis=0)
+
+    def _train_leaf(self, path, data):
+        # Leaves keep their examples in an ExampleStore, like flat categories,
+        # so the example budget and near-duplicate filter apply here too
+        keywords = list(data.get('keywords', []))
+        if keywords:
+            self.keyword_vectors[path] = self.model.encode(keywords, convert_to_numpy=True)
+        store = self._new_example_store()
+        if data.get('examples'):
+            store.extend(data['examples'], self.model.encode(list(data['examples']), convert_to_numpy=True))
+        self.example_stores[path] = store
+        self._refresh_category(path, rebuild_index=False)
+
+    def _refresh_category(self, category, rebuild_index=True):
+        """
+        Recompute a leaf vector from its keywords and example store
+
+        Args:
+            category (str): Leaf path
+            rebuild_index (bool): Rebuild the centroid index afterwards
+        """
+        store = self.example_stores[category]
+        self.categories[category]['examples'] = list(store.texts)
+        parts = []
+        if category in self.keyword_vectors:
+            parts.append(self.keyword_vectors[category])
+        if len(store):
+            parts.append(store.embeddings)
+        if parts:
+            self.leaf_vectors[category] = np.mean(np.vstack(parts), axis=0)
+        else:
+            self.leaf_vectors.pop(category, None)
+        if rebuild_index:
+            self.index = CategoryIndex(self.tree, self.leaf_vectors, self.node_vectors)
+
+    def train(self, save_path="model_data"):
+        """
+        Encode every node and build the per-level centroid index
+
+        Args:
+            save_path (str): Path to save the trained model data
+        """
+        if self.use_fallback:
+            print("Using fallback mode - no actual training performed")
+            return "fallback_model"
+
+        os.makedirs(save_path, exist_ok=True)
+
+        previous = self._training_state()
+        try:
+            for path, data in self.nodes.items():
+                if path in self.categories:
+                    self._train_leaf(path, data)
+                    continue
+                texts = list(data.get('keywords', [])) + list(data.get('examples', []))
+                if texts:
+                    self.node_vectors[path] = self._encode_texts(texts)
+
+            empty = [path for path in self.categories if path not in self.leaf_vectors]
+            if empty:
+                print(f"⚠️ Skipping categories without keywords or examples: {', '.join(empty)}")
+            self.index = CategoryIndex(self.tree, self.leaf_vectors, self.node_vectors)
+
+            model_data = {
+                'model_name': self.model_name,
+                'taxonomy': self.tree_spec,
+                'leaf_vectors': self.leaf_vectors,
+                'node_vectors': self.node_vectors,
+                'keyword_vectors': self.keyword_vectors,
+                'example_vectors': {
+                    path: store.embeddings for path, store in self.example_stores.items() if len(store)
+                }
+            }
+
+            with open(os.path.join(save_path, 'hierarchy_data.pkl'), 'wb') as f:
+                pickle.dump(model_data, f)
+
+            return os.path.join(save_path, 'hierarchy_data.pkl')
+        except Exception as e:
+            print(f"Error during training: {e}")
+            print("Keeping the previous model state")
+            self._restore_training_state(previous)
+            self._circuit_breaker().record_failure()
+            return "fallback_model"
+
+    def _training_state(self):
+        # _refresh_category() also rewrites each leaf's example list
+        examples = {path: data.get('examples') for path, data in self._leaves.items()}
+        return (dict(self.leaf_vectors), dict(self.node_vectors), dict(self.keyword_vectors),
+                dict(self.example_stores), self.index, examples)
+
+    def _restore_training_state(self, state):
+        (self.leaf_vectors, self.node_vectors, self.keyword_vectors,
+         self.example_stores, self.index, examples) = state
+        for path, leaf_examples in examples.items():
+            if leaf_examples is None:
+                self._leaves[path].pop('examples', None)
+            else:
+                self._leaves[path]['examples'] = leaf_examples
+
+    def _is_trained(self):
+        return self.index is not None
+
+    def load(self, model_path):
+        """
+        Load trained hierarchy data from disk
+
+        Args:
+            model_path (str): Path to the saved hierarchy data
+        """
+        with open(model_path, 'rb') as f:
+            model_data = pickle.load(f)
+
+        self.model_name = model_data['model_name']
+        self.tree_spec = model_data['taxonomy']
+        self._leaves, self.nodes, self.tree = flatten_taxonomy(self.tree_spec)
+        self._matcher = None
+        self.leaf_vectors = model_data['leaf_vectors']
+        self.node_vectors = model_data['node_vectors']
+        self.index = CategoryIndex(self.tree, self.leaf_vectors, self.node_vectors)
+
+        # Hierarchies saved before leaves had example stores fall back to a
+        # full train() in add_training_example()
+        self.keyword_vectors = model_data.get('keyword_vectors', {})
+        self.example_stores = {}
+        if 'example_vectors' in model_data:
+            for path in self.categories:
+                store = self._new_example_store()
+                if path in model_data['example_vectors']:
+                    store.restore(self.categories[path].get('examples', []),
+                                  model_data['example_vectors'][path])
+                self.example_stores[path] = store
+
+    def _encode_query(self, query):
+        return self.model.encode(query, convert_to_numpy=True, normalize_embeddings=True)
+
+    def _encode_queries(self, queries):
+        return list(self.model.encode(queries, convert_to_numpy=True, normalize_embeddings=True))
+
+    def _similarities(self, query_embedding):
+        # A one-level tree is the flat classifier: every leaf gets a score
+        if len(self.index.children) == 1:
+            return self.index.score_flat(query_embedding)
+        scores, _ = self.index.beam_search(query_embedding, self.beam_width)
+        return scores
+
+    def classify_path(self, query):
+        """
+        Classify a query and report the chosen node at every level
+
+        Args:
+            query (str): The query to classify
+
+        Returns:
+            list: One dict per level with 'level', 'category' (node path) and
+                'confidence' (share among siblings, in percent)
+        """
+        query_embedding = None
+        if not self.use_fallback:
+            _, _, query_embedding = self._semantic_similarities(query)
+        if query_embedding is None:
+            scores = self._keyword_scores(query)
+            category = self._keyword_category(scores)
+            if category == "unknown":
+                return []
+            confidence = self._keyword_confidence(scores)
+            return [{"level": 0, "category": category, "confidence": confidence[category]}]
+
+        scores, confidence = self.index.beam_search(query_embedding, self.beam_width)
+        best = max(scores, key=scores.get)
+        parts = best.split(PATH_SEPARATOR)
+        path = []
+        for level in range(len(parts)):
+            node = PATH_SEPARATOR.join(parts[:level + 1])
+            path.append({"level": level, "category": node, "confidence": confidence[node]})
+        return path
@@ -0,0 +1,191 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Stop calling a failing dependency for a while instead of giving up on it
+
+    After failure_threshold consecutive failures the breaker opens and
+    allow() returns False. Once reset_timeout has passed a single trial call
+    is let through (half-open); its success closes the breaker again and its
+    failure re-opens it for another reset_timeout.
+    """
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        """
+        Initialize a closed breaker
+
+        Args:
+            failure_threshold (int): Consecutive failures that open the breaker
+            reset_timeout (float): Seconds to stay open before a trial call
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Classifiers are pickled with save_model(); locks cannot be.
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Check whether a call may go to the protected dependency
+
+        Returns:
+            bool: True if the call should be attempted
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._trial_running = False
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class LoadShedder:
+    """
+    Decide when new requests should skip the encoder under latency pressure
+
+    Shedding starts when too many requests are inside the encoder or the p95
+    latency over the last window_seconds reaches the threshold. It stops once
+    p95 falls below recover_ratio times the threshold; while shedding, one
+    probe request per probe_interval still takes the encoder path so the
+    latency window keeps reflecting current conditions. The window keeps at
+    most max_samples latencies and p95 is recomputed at most every
+    p95_interval seconds, so the check stays cheap under heavy traffic.
+    """
+    def __init__(self, p95_threshold_ms=500, max_in_flight=8, window_seconds=10.0,
+                 min_samples=20, recover_ratio=0.7, probe_interval=1.0, max_samples=1000,
+                 p95_interval=0.1):
+        """
+        Initialize the shedder
+
+        Args:
+            p95_threshold_ms (float): p95 encoder latency that triggers shedding
+            max_in_flight (int): Concurrent encoder requests that trigger shedding
+            window_seconds (float): Age of the latency samples considered
+            min_samples (int): Samples needed before p95 is trusted
+            recover_ratio (float): Fraction of the threshold p95 must fall
+                below before shedding stops
+            probe_interval (float): Seconds between probes while shedding
+            max_samples (int): Most recent latencies kept in the window
+            p95_interval (float): Seconds a computed p95 is reused
+        """
+        self.p95_threshold = p95_threshold_ms / 1000
+        self.max_in_flight = max_in_flight
+        self.window_seconds = window_seconds
+        self.min_samples = min_samples
+        self.recover_ratio = recover_ratio
+        self.probe_interval = probe_interval
+        self.p95_interval = p95_interval
+
+        self.in_flight = 0
+        self.shedding = False
+        self.shed_count = 0
+        self._samples = deque(maxlen=max_samples)
+        self._p95_cache = None
+        self._p95_at = -np.inf
+        self._last_probe = 0.0
+        self._lock = threading.Lock()
+
+    def _p95(self, now):
+        if now - self._p95_at < self.p95_interval:
+            return self._p95_cache
+        while self._samples and now - self._samples[0][0] > self.window_seconds:
+            self._samples.popleft()
+        if len(self._samples) < self.min_samples:
+            p95 = None
+        else:
+            p95 = float(np.percentile([latency for _, latency in self._samples], 95))
+        self._p95_cache, self._p95_at = p95, now
+        return p95
+
+    def should_shed(self):
+        """
+        Decide whether the next request should go to the keyword path
+
+        Returns:
+            str: 'queue' or 'latency' if the request should be shed, else None
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.in_flight >= self.max_in_flight:
+                self.shed_count += 1
+                return "queue"
+
+            p95 = self._p95(now)
+            if self.shedding:
+                if p95 is None or p95 < self.p95_threshold * self.recover_ratio:
+                    self.shedding = False
+            elif p95 is not None and p95 >= self.p95_threshold:
+                self.shedding = True
+
+            if self.shedding and now - self._last_probe < self.probe_interval:
+                self.shed_count += 1
+                return "latency"
+            if self.shedding:
+                self._last_probe = now
+            return None
+
+    @contextmanager
+    def track(self):
+        """
+        Count a request as in flight and record its latency
+        """
+        with self._lock:
+            self.in_flight += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            end = time.monotonic()
+            with self._lock:
+                self.in_flight -= 1
+                self._samples.append((end, end - start))
+
+    def stats(self):
+        with self._lock:
+            p95 = self._p95(time.monotonic())
+            return {
+                "shedding": self.shedding,
+                "in_flight": self.in_flight,
+                "p95_ms": None if p95 is None else p95 * 1000,
+                "p95_threshold_ms": self.p95_threshold * 1000,
+                "max_in_flight": self.max_in_flight,
+                "shed_count": self.shed_count
+            }
@@ -1,5 +1,6 @@
 import json
 import os
+from taxonomy import load_taxonomy
 
 try:
     from sbert_classifier import SBERTQueryClassifier
@@ -22,12 +23,7 @@ def load_training_data():
     with open('training_data.json', 'r') as f:
         training_data = json.load(f)
     
-    classifier = Classifier()
-    
-    for category, examples in training_data.items():
-        if category in classifier.categories:
-            for example in examples:
-                classifier.categories[category]['examples'].append(example)
+    classifier = Classifier(taxonomy=load_taxonomy("civic").with_examples(training_data))
     
     # Train the model
     model_path = classifier.train()
@@ -0,0 +1,132 @@
+import os
+import time
+import hashlib
+import threading
+
+SMOKE_QUERIES = [
+    "How to report potholes in my area?",
+    "Frequent power cuts in my area",
+    "Garbage not collected for a week"
+]
+
+
+def read_artifact(path):
+    """
+    Read a model artifact once, so its version and the loaded model always
+    describe the same bytes even if the file is replaced meanwhile
+
+    Args:
+        path (str): Path to the artifact
+
+    Returns:
+        tuple: (data, version) where version is the first 12 hex digits of
+            the content's SHA-256
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    return data, hashlib.sha256(data).hexdigest()[:12]
+
+
+class ModelWatcher:
+    """
+    Poll a model artifact and hand freshly loaded, warmed models to a callback
+
+    A change is only picked up once the file's size and mtime are the same on
+    two consecutive polls, so a model that is still being written is never
+    loaded. Loading and the smoke classification run on the watcher thread;
+    the callback only has to swap a reference.
+    """
+    def __init__(self, path, loader, on_swap, interval=5.0, smoke_queries=SMOKE_QUERIES):
+        """
+        Initialize the watcher; the artifact currently on disk counts as loaded
+
+        Args:
+            path (str): Model artifact to watch
+            loader (callable): Takes the artifact's bytes and returns a classifier
+            on_swap (callable): Called as on_swap(classifier, version, load_seconds)
+            interval (float): Seconds between polls
+            smoke_queries (list): Queries classified before a model goes live
+        """
+        self.path = path
+        self.loader = loader
+        self.on_swap = on_swap
+        self.interval = interval
+        self.smoke_queries = smoke_queries
+        self.last_error = None
+
+        self._loaded = self._signature()
+        self._pending = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def poll(self):
+        """
+        Check the artifact once and reload it if it changed and is stable
+
+        Returns:
+            bool: True if a new model was swapped in
+        """
+        signature = self._signature()
+        if signature is None or signature == self._loaded:
+            self._pending = None
+            return False
+        if signature != self._pending:
+            self._pending = signature
+            return False
+
+        self._pending = None
+        # Mark it loaded even if it fails, so a broken artifact is not
+        # reloaded every poll; the next write retries.
+        self._loaded = signature
+        return self.reload()
+
+    def reload(self):
+        """
+        Load, warm and smoke-test the artifact, then hand it to on_swap
+
+        Returns:
+            bool: True if the new model was swapped in
+        """
+        start = time.perf_counter()
+        try:
+            data, version = read_artifact(self.path)
+            classifier = self.loader(data)
+            for query in self.smoke_queries:
+                category = classifier.classify_query(query)
+                confidence = classifier.get_confidence_scores(query)
+                if not isinstance(category, str) or not isinstance(confidence, dict):
+                    raise ValueError(f"Smoke classification of '{query}' returned {category!r}")
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"⚠️ Keeping current model, could not reload {self.path}: {e}")
+            return False
+
+        self.last_error = None
+        self.on_swap(classifier, version, time.perf_counter() - start)
+        return True
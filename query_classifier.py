@@ -1,10 +1,10 @@
-import re
 import json
 import nltk
 from nltk.tokenize import word_tokenize
 from nltk.corpus import stopwords
 from nltk.stem import WordNetLemmatizer
 import string
+from taxonomy import load_taxonomy
 
 try:
     nltk.data.find('tokenizers/punkt')
@@ -16,66 +16,21 @@ except LookupError:
     nltk.download('wordnet')
 
 class GovQueryClassifier:
-    def __init__(self):
-        self.categories = {
-            "education": {
-                "keywords": [
-                    "education", "school", "college", "university", "student", 
-                    "teacher", "professor", "classroom", "curriculum", "degree",
-                    "scholarship", "admission", "academic", "learning", "teaching",
-                    "exam", "course", "study", "board", "ugc", "ncert", "cbse", "icse",
-                    "sarva shiksha abhiyan", "mid-day meal", "right to education"
-                ],
-                "patterns": [
-                    r"educat\w+", r"school\w*", r"colleg\w+", r"univers\w+", 
-                    r"stud\w+", r"teach\w+", r"class\w+", r"learn\w+"
-                ]
-            },
-            "highway": {
-                "keywords": [
-                    "highway", "road", "transport", "vehicle", "traffic", "bridge", 
-                    "toll", "construction", "infrastructure", "expressway", "national highway",
-                    "state highway", "nhai", "morth", "roadway", "corridor", "lane",
-                    "bharatmala", "pradhan mantri gram sadak yojana", "pmgsy"
-                ],
-                "patterns": [
-                    r"highway\w*", r"road\w*", r"transport\w+", r"vehic\w+", 
-                    r"traffic\w*", r"bridge\w*", r"infrastruct\w+"
-                ]
-            },
-            "electricity": {
-                "keywords": [
-                    "electricity", "power", "energy", "grid", "transmission", "distribution",
-                    "generation", "solar", "wind", "hydro", "thermal", "renewable", "voltage",
-                    "transformer", "substation", "billing", "meter", "connection", "outage",
-                    "discom", "ntpc", "nhpc", "pgcil", "saubhagya", "ddugjy", "kusum"
-                ],
-                "patterns": [
-                    r"electric\w+", r"power\w*", r"energ\w+", r"grid\w*", 
-                    r"transmi\w+", r"distribut\w+", r"generat\w+"
-                ]
-            },
-            "water": {
-                "keywords": [
-                    "water", "irrigation", "dam", "canal", "river", "lake", "reservoir",
-                    "drinking water", "sanitation", "sewage", "drainage", "flood", "drought",
-                    "watershed", "groundwater", "rainwater", "harvesting", "pipeline",
-                    "jal jeevan mission", "namami gange", "swachh bharat", "amrut"
-                ],
-                "patterns": [
-                    r"water\w*", r"irrigat\w+", r"dam\w*", r"canal\w*", 
-                    r"river\w*", r"reservoir\w*", r"sanitat\w+"
-                ]
-            }
-        }
+    def __init__(self, taxonomy=None):
+        self.taxonomy = taxonomy if taxonomy is not None else load_taxonomy("departments")
         
         self.stop_words = set(stopwords.words('english'))
         self.lemmatizer = WordNetLemmatizer()
+        self.punctuation_table = str.maketrans('', '', string.punctuation)
+    
+    @property
+    def categories(self):
+        return self.taxonomy.categories
         
     def preprocess_text(self, text):
         text = text.lower()
         
-        text = text.translate(str.maketrans('', '', string.punctuation))
+        text = text.translate(self.punctuation_table)
         
         tokens = word_tokenize(text)
         
@@ -87,24 +42,22 @@ class GovQueryClassifier:
         
         return processed_tokens
     
-    def classify_query(self, query):
+    def _scores(self, query):
         processed_query = self.preprocess_text(query)
         query_text = ' '.join(processed_query)
         
-        scores = {}
+        # A keyword equal to a token is also a substring of the joined text,
+        # so one substring check covers both original conditions
+        keyword_counts = self.taxonomy.keyword_matcher.counts(query_text)
+        pattern_counts = self.taxonomy.pattern_counts(query_text)
         
-        for category, features in self.categories.items():
-            score = 0
-            
-            for keyword in features["keywords"]:
-                if keyword in processed_query or keyword in query_text:
-                    score += 1
-            
-            for pattern in features["patterns"]:
-                matches = re.findall(pattern, query_text)
-                score += len(matches)
-            
-            scores[category] = score
+        return {
+            category: keyword_counts[i] + pattern_counts[i]
+            for i, category in enumerate(self.taxonomy.names)
+        }
+    
+    def classify_query(self, query):
+        scores = self._scores(query)
         
         if all(score == 0 for score in scores.values()):
             return "unknown"
@@ -113,23 +66,7 @@ class GovQueryClassifier:
         return max_category
     
     def get_confidence_scores(self, query):
-        processed_query = self.preprocess_text(query)
-        query_text = ' '.join(processed_query)
-        
-        scores = {}
-        
-        for category, features in self.categories.items():
-            score = 0
-            
-            for keyword in features["keywords"]:
-                if keyword in processed_query or keyword in query_text:
-                    score += 1
-            
-            for pattern in features["patterns"]:
-                matches = re.findall(pattern, query_text)
-                score += len(matches)
-            
-            scores[category] = score
+        scores = self._scores(query)
         
         total_score = sum(scores.values())
         
@@ -0,0 +1,237 @@
+"""
+On-demand stack sampling of a live worker
+
+capture() takes a snapshot of every thread's Python stack with
+sys._current_frames() at a fixed interval for a bounded duration and
+returns the stacks in collapsed ("folded") form, which flamegraph.pl and
+speedscope read directly, plus the share of samples spent in each stage of
+classification. Nothing is installed between captures, so an idle
+profiler costs nothing.
+"""
+import os
+import sys
+import time
+import threading
+from collections import Counter
+
+MAX_SECONDS = 30.0
+MIN_INTERVAL = 0.001
+STAGES = ("preprocessing", "tokenizer", "encoder_forward", "scoring", "other")
+
+# Each rule maps a function name to the files defining it, as path
+# fragments, so that e.g. JSONEncoder.encode or Mapping.get never match
+_CLASSIFIERS = ("/sbert_classifier.py", "/keyword_classifier.py", "/query_classifier.py",
+                "/hierarchical_classifier.py")
+_SBERT = ("/sbert_classifier.py", "/hierarchical_classifier.py")
+
+# Frames that mark a stack as part of handling a classification
+CLASSIFY_FRAMES = {
+    "classify": ("/backend_integration.py", "/tenant_registry.py"),
+    "classify_for_tenant": ("/backend_integration.py",),
+    "classify_query": _CLASSIFIERS,
+    "get_confidence_scores": _CLASSIFIERS,
+    "classify_with_details": _CLASSIFIERS + ("/tenant_registry.py",),
+    "classify_long": _SBERT,
+    "classify_path": ("/hierarchical_classifier.py",)
+}
+PREPROCESSING_FRAMES = {
+    "preprocess_text": ("/keyword_classifier.py", "/query_classifier.py"),
+    "split_into_chunks": ("/sbert_classifier.py",)
+}
+ENCODER_FRAMES = {
+    "encode": ("/sentence_transformers/",),
+    "_encode_query": _SBERT,
+    "_encode_queries": _SBERT
+}
+TOKENIZER_FRAMES = {
+    "tokenize": ("/sentence_transformers/",)
+}
+SCORING_FRAMES = {
+    "_similarities": _SBERT,
+    "_semantic_category": _SBERT,
+    "_semantic_confidence": _SBERT,
+    "_keyword_scores": _SBERT + ("/tenant_registry.py",),
+    "_keyword_category": _SBERT,
+    "_keyword_confidence": _SBERT,
+    "_scores": ("/query_classifier.py",),
+    "scores": ("/taxonomy.py",),
+    "counts": ("/taxonomy.py",),
+    "pattern_counts": ("/taxonomy.py",),
+    "beam_search": ("/hierarchical_classifier.py",),
+    "score_flat": ("/hierarchical_classifier.py",),
+    "cos_sim": ("/sentence_transformers/",)
+}
+# Leaf frames of threads that are only waiting for work
+IDLE_FRAMES = {
+    "wait": ("/threading.py",),
+    "_wait_for_tstate_lock": ("/threading.py",),
+    "select": ("/selectors.py",),
+    "poll": ("/multiprocessing/connection.py",),
+    "accept": ("/socket.py",),
+    "readinto": ("/socket.py",),
+    "recv_into": ("/ssl.py",),
+    "get": ("/queue.py",),
+    "serve_forever": ("/socketserver.py",),
+    "_worker": ("/concurrent/futures/thread.py",)
+}
+
+_capture_lock = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """Raised when a capture is requested while another one is running"""
+
+
+def matches(frame, rules):
+    """
+    Whether a frame runs one of the functions in rules
+
+    Args:
+        frame: A Python frame object
+        rules (dict): Function name to path fragments of the files
+            defining it
+
+    Returns:
+        bool: True if the function name and its file both match
+    """
+    code = frame.f_code
+    fragments = rules.get(code.co_name)
+    if not fragments:
+        return False
+    filename = "/" + code.co_filename.replace("\\", "/")
+    return any(fragment in filename for fragment in fragments)
+
+
+def frame_stage(frame):
+    """
+    Stage named by a single frame's function, or None if it names none
+
+    Args:
+        frame: A Python frame object
+
+    Returns:
+        str: 'encoder_forward', 'preprocessing', 'scoring' or None
+    """
+    if matches(frame, ENCODER_FRAMES):
+        return "encoder_forward"
+    if matches(frame, PREPROCESSING_FRAMES):
+        return "preprocessing"
+    if matches(frame, SCORING_FRAMES):
+        return "scoring"
+    return None
+
+
+def _is_tokenizer(frame):
+    filename = frame.f_code.co_filename.replace("\\", "/")
+    return ("tokeniz" in filename and ("/transformers/" in filename or "/tokenizers/" in filename)) \
+        or matches(frame, TOKENIZER_FRAMES)
+
+
+def stack_stage(frames):
+    """
+    Stage of a classification stack
+
+    The outermost frame naming a stage decides it, so library code called
+    while scoring (e.g. torch's normalize under cos_sim) is not mistaken
+    for the encoder. Only under an encoder frame, or under no named frame
+    at all, do tokenizer and NLTK files refine the answer.
+
+    Args:
+        frames (list): Frames of one stack, leaf first
+
+    Returns:
+        str: One of STAGES
+    """
+    stage = next(filter(None, map(frame_stage, reversed(frames))), None)
+    if stage in (None, "encoder_forward") and any(map(_is_tokenizer, frames)):
+        return "tokenizer"
+    if stage is None and any("/nltk/" in f.f_code.co_filename.replace("\\", "/") for f in frames):
+        return "preprocessing"
+    return stage or "other"
+
+
+def _walk(frame):
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        frame = frame.f_back
+    return frames  # leaf first
+
+
+def _label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def capture(duration=5.0, interval=0.005, include_idle=False):
+    """
+    Sample all other threads' stacks for a bounded time
+
+    Runs in the calling thread and returns when done. Only one capture can
+    run at a time in the process.
+
+    Args:
+        duration (float): Seconds to sample, capped at MAX_SECONDS
+        interval (float): Seconds between samples, at least MIN_INTERVAL
+        include_idle (bool): Also keep stacks of threads waiting for work
+
+    Returns:
+        dict: 'duration_s', 'interval_ms', 'samples', 'classification_samples',
+            'stages' (samples and share of classification samples per stage)
+            and 'collapsed' (folded stacks, one 'frame;frame;... count' per line)
+
+    Raises:
+        ProfilerBusy: If another capture is running
+    """
+    if not _capture_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile capture is already running")
+    try:
+        duration = min(max(0.0, duration), MAX_SECONDS)
+        interval = max(interval, MIN_INTERVAL)
+        me = threading.get_ident()
+        names = {}
+        stacks = Counter()
+        stages = Counter()
+        samples = 0
+
+        start = time.perf_counter()
+        deadline = start + duration
+        while True:
+            for ident, leaf in sys._current_frames().items():
+                if ident == me:
+                    continue
+                frames = _walk(leaf)
+                if not include_idle and matches(frames[0], IDLE_FRAMES):
+                    continue
+                samples += 1
+                if ident not in names:
+                    names.update((t.ident, t.name) for t in threading.enumerate())
+                    names.setdefault(ident, str(ident))
+                stacks[";".join([names[ident]] + [_label(f) for f in reversed(frames)])] += 1
+
+                if any(matches(f, CLASSIFY_FRAMES) for f in frames):
+                    stages[stack_stage(frames)] += 1
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            time.sleep(min(interval, deadline - now))
+        elapsed = time.perf_counter() - start
+    finally:
+        _capture_lock.release()
+
+    classified = sum(stages.values())
+    return {
+        "duration_s": elapsed,
+        "interval_ms": interval * 1000,
+        "samples": samples,
+        "classification_samples": classified,
+        "stages": {
+            stage: {
+                "samples": stages[stage],
+                "share": stages[stage] / classified if classified else 0.0
+            }
+            for stage in STAGES
+        },
+        "collapsed": "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    }
+
@@ -1,4 +1,5 @@
 import os
+import re
 import json
 import torch
 import numpy as np
@@ -10,16 +11,87 @@ except ImportError:
     util = None
 from sklearn.metrics.pairwise import cosine_similarity
 import pickle
+from example_store import ExampleStore
+from load_shedding import CircuitBreaker
+from taxonomy import Taxonomy, load_taxonomy
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;])\s+|\n+")
+CONJUNCTION = re.compile(r"\s+((?:and|but)\s+also|and|but|also|plus)\s+", re.IGNORECASE)
+
+
+def _split_conjunctions(sentence, min_clause_words):
+    # Only cut at a joining word when the words right before and after it
+    # could be clauses, so short noun phrases such as 'law and order' stay
+    # whole
+    parts = CONJUNCTION.split(sentence)
+    clauses = [parts[0]]
+    for previous, conjunction, part in zip(parts[0::2], parts[1::2], parts[2::2]):
+        if len(previous.split()) < min_clause_words or len(part.split()) < min_clause_words:
+            clauses[-1] = f"{clauses[-1]} {conjunction} {part}"
+        else:
+            clauses.append(part)
+    return clauses
+
+
+def split_into_chunks(text, max_words=32, overlap=8, min_words=2, min_clause_words=4):
+    """
+    Split a long complaint into clause-sized chunks
+    
+    Text is cut at sentence ends, semicolons and line breaks, and at joining
+    words such as 'and'/'but' when both sides have at least
+    min_clause_words words; clauses longer than max_words are cut again
+    into overlapping windows. Clauses shorter than min_words are merged
+    into the previous chunk.
+    
+    Args:
+        text (str): The text to split
+        max_words (int): Longest chunk, in words
+        overlap (int): Words shared by consecutive windows of one clause
+        min_words (int): Shortest clause kept on its own
+        min_clause_words (int): Shortest side of a joining word that is
+            still split off
+        
+    Returns:
+        list: Chunk strings in text order
+    """
+    clauses = []
+    for clause in (
+        clause
+        for sentence in SENTENCE_BOUNDARY.split(text)
+        for clause in _split_conjunctions(sentence, min_clause_words)
+    ):
+        words = clause.split()
+        if not words:
+            continue
+        if clauses and len(words) < min_words:
+            clauses[-1].extend(words)
+        else:
+            clauses.append(words)
+    
+    stride = max(1, max_words - overlap)
+    chunks = []
+    for words in clauses:
+        for start in range(0, max(1, len(words) - overlap), stride):
+            chunks.append(" ".join(words[start:start + max_words]))
+    return chunks
 
 class SBERTQueryClassifier:
-    def __init__(self, model_name='paraphrase-MiniLM-L6-v2'):
+    def __init__(self, model_name='paraphrase-MiniLM-L6-v2', example_budget=200, duplicate_threshold=0.95,
+                 taxonomy=None):
         """
         Initialize the SBERT Query Classifier
         
         Args:
             model_name (str): Name of the pre-trained SBERT model to use
+            example_budget (int): Maximum examples kept per category; None for no limit
+            duplicate_threshold (float): Cosine similarity above which a new
+                example is dropped as a near-duplicate
+            taxonomy (Taxonomy): Categories to classify into; defaults to the
+                shared 'civic' taxonomy
         """
         self.model_name = model_name
+        self.example_budget = example_budget
+        self.duplicate_threshold = duplicate_threshold
         self.use_fallback = SentenceTransformer is None
         
         if not self.use_fallback:
@@ -29,154 +101,44 @@ class SBERTQueryClassifier:
                 print(f"Error loading SBERT model: {e}")
                 print("Using fallback keyword-based classifier")
                 self.use_fallback = True
-        self.categories = {
-            "infrastructure": {
-                "keywords": [
-                    "infrastructure", "broken road", "pothole", "damaged footpath", "streetlight", 
-                    "not working", "pwd", "public works department", "mcd", "municipal corporation", 
-                    "road repair", "street maintenance", "construction", "pavement", "sidewalk"
-                ],
-                "examples": [
-                    "How to report potholes in my area?",
-                    "When will the broken streetlights be fixed?",
-                    "Who is responsible for repairing damaged footpaths?",
-                    "How to file a complaint about road conditions?",
-                    "What department handles street maintenance issues?"
-                ]
-            },
-            "water_sanitation": {
-                "keywords": [
-                    "water", "leakage", "dirty water", "sewer", "overflow", "garbage", "waste", 
-                    "collection", "delhi jal board", "djb", "mcd sanitation", "drainage", "pipeline", 
-                    "tap", "drinking", "sewage", "cleanliness", "trash", "dump"
-                ],
-                "examples": [
-                    "How to report water leakage in my area?",
-                    "Who to contact for sewer overflow problems?",
-                    "When will garbage collection resume in my locality?",
-                    "How to file a complaint about dirty water supply?",
-                    "What department handles sanitation issues?"
-                ]
-            },
-            "electricity_power": {
-                "keywords": [
-                    "electricity", "power", "cut", "outage", "bill", "high bill", "meter", "faulty meter", 
-                    "unsafe connection", "bses", "tpddl", "distribution company", "energy", "voltage", 
-                    "connection", "transformer", "supply", "electric"
-                ],
-                "examples": [
-                    "How to report frequent power cuts?",
-                    "Who to contact about high electricity bills?",
-                    "How to get a faulty meter replaced?",
-                    "When will power be restored in my area?",
-                    "How to report unsafe electrical connections?"
-                ]
-            },
-            "health_safety": {
-                "keywords": [
-                    "health", "safety", "sanitation", "hospital", "unhygienic", "stray dog", "medical", 
-                    "clinic", "disease", "infection", "delhi health department", "mcd health", "public health", 
-                    "cleanliness", "hygiene", "emergency", "ambulance", "doctor", "patient"
-                ],
-                "examples": [
-                    "How to report unhygienic conditions in hospitals?",
-                    "Who handles stray dog issues in residential areas?",
-                    "How to file a complaint about poor sanitation?",
-                    "What department is responsible for public health?",
-                    "How to request emergency medical services?"
-                ]
-            },
-            "education_government": {
-                "keywords": [
-                    "education", "government service", "teacher", "certificate", "ration card", "school", 
-                    "college", "university", "department of education", "food supply", "civil supplies", 
-                    "revenue department", "admission", "scholarship", "student", "classroom", "study"
-                ],
-                "examples": [
-                    "How to apply for school admission?",
-                    "What are the best colleges for engineering?",
-                    "How to get a ration card issued?",
-                    "When will certificates be issued by the revenue department?",
-                    "How to report shortage of teachers in schools?"
-                ]
-            },
-            "transport_traffic": {
-                "keywords": [
-                    "transport", "traffic", "congestion", "illegal parking", "traffic light", "signal", 
-                    "delhi traffic police", "transport department", "gnctd", "vehicle", "road", "highway", 
-                    "bus", "metro", "public transport", "jam", "accident", "driver", "commute"
-                ],
-                "examples": [
-                    "How to report traffic congestion issues?",
-                    "Who to contact about illegal parking?",
-                    "How to report broken traffic signals?",
-                    "What department handles public transport problems?",
-                    "How to file a complaint about reckless driving?"
-                ]
-            },
-            "law_order": {
-                "keywords": [
-                    "law", "order", "theft", "harassment", "nuisance", "illegal construction", "delhi police", 
-                    "municipal enforcement", "crime", "security", "safety", "complaint", "fir", "police station", 
-                    "investigation", "protection", "violation", "enforcement"
-                ],
-                "examples": [
-                    "How to report theft in my neighborhood?",
-                    "Who to contact about harassment issues?",
-                    "How to file a complaint about illegal construction?",
-                    "What department handles public nuisance complaints?",
-                    "How to register an FIR at the police station?"
-                ]
-            },
-            "environmental": {
-                "keywords": [
-                    "environment", "pollution", "tree cutting", "illegal dumping", "noise pollution", 
-                    "delhi pollution control", "dpcc", "forest department", "air quality", "water pollution", 
-                    "waste management", "green", "conservation", "ecology", "climate", "sustainable"
-                ],
-                "examples": [
-                    "How to report air pollution in my area?",
-                    "Who to contact about illegal tree cutting?",
-                    "How to file a complaint about waste dumping?",
-                    "What department handles noise pollution issues?",
-                    "How to report water pollution in local water bodies?"
-                ]
-            },
-            "corruption_delays": {
-                "keywords": [
-                    "corruption", "administrative delay", "bribe", "pending file", "misuse of power", 
-                    "vigilance department", "anti-corruption branch", "acb", "bureaucracy", "red tape", 
-                    "official", "government officer", "complaint", "transparency", "accountability"
-                ],
-                "examples": [
-                    "How to report corruption in government offices?",
-                    "Who to contact about administrative delays?",
-                    "How to file a complaint about bribery demands?",
-                    "What department handles misuse of power by officials?",
-                    "How to track status of pending files in government departments?"
-                ]
-            },
-            "digital_technical": {
-                "keywords": [
-                    "digital", "technical", "website error", "online complaint", "portal", "it department", 
-                    "nic", "national informatics centre", "software", "application", "login", "password", 
-                    "account", "online service", "e-governance", "internet", "computer", "system"
-                ],
-                "examples": [
-                    "How to report government website errors?",
-                    "Who to contact when online complaint portal is not working?",
-                    "How to resolve login issues with government portals?",
-                    "What department handles e-governance technical problems?",
-                    "How to get help with online service applications?"
-                ]
-            }
-        }
+        # Keywords and the keyword matcher come straight from the shared
+        # taxonomy; examples added later live in the example stores
+        self.taxonomy = taxonomy if taxonomy is not None else load_taxonomy("civic")
         
         self.embeddings = {}
         
         self.category_embeddings = {}
         self.keyword_embeddings = {}
         self.example_embeddings = {}
+        self.example_stores = {}
+        self.breaker = CircuitBreaker()
+    
+    def __setstate__(self, state):
+        # Instances pickled before the shared Taxonomy kept a mutable
+        # categories dict and their own keyword matcher
+        categories = state.pop('categories', None)
+        state.pop('_matcher', None)
+        self.__dict__.update(state)
+        if categories is not None and 'taxonomy' not in state:
+            self.taxonomy = Taxonomy("civic", categories)
+    
+    @property
+    def categories(self):
+        """Category names mapped to their keywords and examples (read-only)"""
+        return self.taxonomy.categories
+    
+    def _examples(self, category):
+        store = getattr(self, 'example_stores', {}).get(category)
+        if store is not None:
+            return list(store.texts)
+        return list(self.taxonomy.examples[self.taxonomy.index[category]])
+    
+    def _categories_snapshot(self):
+        # Plain dicts for model_data.pkl, which tenant registries read
+        return {
+            category: {'keywords': list(data['keywords']), 'examples': self._examples(category)}
+            for category, data in self.categories.items()
+        }
         
     def train(self, save_path="model_data"):
         """
@@ -192,27 +154,25 @@ class SBERTQueryClassifier:
 
         os.makedirs(save_path, exist_ok=True)
         
+        previous = self._training_state()
         try:
             for category, data in self.categories.items():
-                keywords = data['keywords']
+                keywords = list(data['keywords'])
                 keyword_embeddings = self.model.encode(keywords, convert_to_tensor=True)
                 self.keyword_embeddings[category] = keyword_embeddings
                 
-                examples = data['examples']
+                # Retraining keeps the examples added since the last train()
+                examples = self._examples(category)
+                store = self._new_example_store()
                 if examples:  # Only encode if there are examples
-                    example_embeddings = self.model.encode(examples, convert_to_tensor=True)
-                    self.example_embeddings[category] = example_embeddings
-                    
-                    all_embeddings = torch.cat([keyword_embeddings, example_embeddings], dim=0)
-                    category_embedding = torch.mean(all_embeddings, dim=0)
-                else:
-                    category_embedding = torch.mean(keyword_embeddings, dim=0)
-                    
-                self.category_embeddings[category] = category_embedding
+                    example_embeddings = self.model.encode(examples, convert_to_numpy=True)
+                    store.extend(examples, example_embeddings)
+                self.example_stores[category] = store
+                self._refresh_category(category)
             
             model_data = {
                 'model_name': self.model_name,
-                'categories': self.categories,
+                'categories': self._categories_snapshot(),
                 'category_embeddings': {k: v.cpu().numpy() for k, v in self.category_embeddings.items()},
                 'keyword_embeddings': {k: v.cpu().numpy() for k, v in self.keyword_embeddings.items()},
                 'example_embeddings': {k: v.cpu().numpy() for k, v in self.example_embeddings.items()}
@@ -223,11 +183,25 @@ class SBERTQueryClassifier:
                 
             return os.path.join(save_path, 'model_data.pkl')
         except Exception as e:
+            # Like a failed encode, a failed training run only counts against
+            # the breaker; the previous centroids (if any) stay in use
             print(f"Error during training: {e}")
-            print("Falling back to keyword-based classification")
-            self.use_fallback = True
+            print("Keeping the previous model state")
+            self._restore_training_state(previous)
+            self._circuit_breaker().record_failure()
             return "fallback_model"
     
+    def _training_state(self):
+        return (dict(self.category_embeddings), dict(self.keyword_embeddings),
+                dict(self.example_embeddings), dict(self.example_stores))
+    
+    def _restore_training_state(self, state):
+        (self.category_embeddings, self.keyword_embeddings,
+         self.example_embeddings, self.example_stores) = state
+    
+    def _is_trained(self):
+        return bool(self.category_embeddings)
+    
     def load(self, model_path):
         """
         Load a trained model from disk
@@ -239,56 +213,184 @@ class SBERTQueryClassifier:
             model_data = pickle.load(f)
         
         self.model_name = model_data['model_name']
-        self.categories = model_data['categories']
+        self.taxonomy = Taxonomy(self.taxonomy.name, model_data['categories'])
         
         self.category_embeddings = {k: torch.tensor(v) for k, v in model_data['category_embeddings'].items()}
         self.keyword_embeddings = {k: torch.tensor(v) for k, v in model_data['keyword_embeddings'].items()}
         self.example_embeddings = {k: torch.tensor(v) for k, v in model_data['example_embeddings'].items()}
+        
+        self.example_stores = {}
+        for category, embeddings in model_data['example_embeddings'].items():
+            examples = model_data['categories'][category]['examples']
+            if len(examples) == len(embeddings):
+                store = self._new_example_store()
+                store.restore(examples, embeddings)
+                self.example_stores[category] = store
     
-    def classify_query(self, query):
+    def _new_example_store(self):
+        # Instances pickled before example budgets existed lack these attributes
+        return ExampleStore(
+            getattr(self, 'example_budget', None),
+            getattr(self, 'duplicate_threshold', 0.95)
+        )
+    
+    def _refresh_category(self, category):
         """
-        Classify a query using SBERT embeddings
+        Recompute a category centroid from its keyword embeddings and example store
         
         Args:
-            query (str): The query to classify
+            category (str): The category to refresh
+        """
+        store = self.example_stores[category]
+        keyword_embeddings = self.keyword_embeddings[category]
+        if len(store):
+            example_embeddings = torch.tensor(store.embeddings).to(keyword_embeddings.device)
+            self.example_embeddings[category] = example_embeddings
+            all_embeddings = torch.cat([keyword_embeddings, example_embeddings], dim=0)
+            self.category_embeddings[category] = torch.mean(all_embeddings, dim=0)
+        else:
+            self.example_embeddings.pop(category, None)
+            self.category_embeddings[category] = torch.mean(keyword_embeddings, dim=0)
+    
+    def _encode_query(self, query):
+        """
+        Encode a single query with the SBERT model
+        
+        Args:
+            query (str): The query to encode
             
         Returns:
-            str: The predicted category
+            torch.Tensor: The query embedding
         """
-        if self.use_fallback:
-            query_lower = query.lower()
-            scores = {}
-            
-            for category, data in self.categories.items():
-                score = 0
-                for keyword in data['keywords']:
-                    if keyword.lower() in query_lower:
-                        score += 1
-                scores[category] = score
-            
-            if max(scores.values()) > 0:
-                return max(scores.items(), key=lambda x: x[1])[0]
-            else:
-                return "unknown"
+        return self.model.encode(query, convert_to_tensor=True)
+    
+    def _encode_queries(self, queries):
+        """
+        Encode several queries in one batch
         
-        try:
-            query_embedding = self.model.encode(query, convert_to_tensor=True)
+        Args:
+            queries (list): The queries to encode
             
-            similarities = {}
-            for category, embedding in self.category_embeddings.items():
-                similarity = util.pytorch_cos_sim(query_embedding, embedding).item()
-                similarities[category] = similarity
+        Returns:
+            list: One embedding per query, as accepted by _similarities()
+        """
+        return list(self.model.encode(queries, convert_to_tensor=True))
+    
+    def _similarities(self, query_embedding):
+        """
+        Score a query embedding against every category centroid
+        
+        Args:
+            query_embedding (torch.Tensor): Embedding from _encode_query()
             
-            if all(sim == 0 for sim in similarities.values()):
-                return "unknown"
+        Returns:
+            dict: Cosine similarity for each category
+        """
+        similarities = {}
+        for category, embedding in self.category_embeddings.items():
+            similarity = util.pytorch_cos_sim(query_embedding, embedding).item()
+            similarities[category] = similarity
+        return similarities
+    
+    def _circuit_breaker(self):
+        # Instances pickled before the breaker existed lack the attribute
+        if getattr(self, 'breaker', None) is None:
+            self.breaker = CircuitBreaker()
+        return self.breaker
+    
+    def _semantic_similarities(self, query):
+        """
+        Score a query with SBERT unless the encoder's circuit breaker is open
+        
+        A failure is reported to the breaker instead of switching to keyword
+        mode permanently, so transient errors only degrade the calls made
+        while the breaker is open.
+        
+        Args:
+            query (str): The query to score
             
-            max_category = max(similarities, key=similarities.get)
-            return max_category
+        Returns:
+            tuple: (similarities, degraded_reason, query_embedding);
+                similarities and query_embedding are None and degraded_reason
+                is 'untrained', 'circuit_open' or 'encoder_error' when the
+                keyword path has to be used
+        """
+        if not self._is_trained():
+            return None, "untrained", None
+        breaker = self._circuit_breaker()
+        if not breaker.allow():
+            return None, "circuit_open", None
+        try:
+            query_embedding = self._encode_query(query)
+            similarities = self._similarities(query_embedding)
         except Exception as e:
             print(f"Error during classification: {e}")
             print("Falling back to keyword-based classification")
-            self.use_fallback = True
-            return self.classify_query(query)  
+            breaker.record_failure()
+            return None, "encoder_error", None
+        breaker.record_success()
+        return similarities, None, query_embedding
+    
+    def _keyword_matcher(self):
+        return self.taxonomy.keyword_matcher
+    
+    def _keyword_scores(self, query):
+        return self._keyword_matcher().scores(query.lower())
+    
+    def _keyword_category(self, scores):
+        if max(scores.values()) > 0:
+            return max(scores.items(), key=lambda x: x[1])[0]
+        else:
+            return "unknown"
+    
+    def _keyword_confidence(self, scores):
+        total_keywords = sum(scores.values())
+        
+        confidence = {}
+        if total_keywords > 0:
+            for category, score in scores.items():
+                confidence[category] = (score / total_keywords) * 100
+        else:
+            for category in scores.keys():
+                confidence[category] = 25.0
+        
+        return confidence
+    
+    def _semantic_category(self, similarities):
+        if all(sim == 0 for sim in similarities.values()):
+            return "unknown"
+        
+        max_category = max(similarities, key=similarities.get)
+        return max_category
+    
+    def _semantic_confidence(self, similarities):
+        total = sum(max(0, sim) for sim in similarities.values())
+        
+        confidence = {}
+        if total > 0:
+            for category, similarity in similarities.items():
+                confidence[category] = (max(0, similarity) / total) * 100
+        else:
+            for category in similarities:
+                confidence[category] = 0
+        
+        return confidence
+    
+    def classify_query(self, query):
+        """
+        Classify a query using SBERT embeddings
+        
+        Args:
+            query (str): The query to classify
+            
+        Returns:
+            str: The predicted category
+        """
+        if not self.use_fallback:
+            similarities, _, _ = self._semantic_similarities(query)
+            if similarities is not None:
+                return self._semantic_category(similarities)
+        return self._keyword_category(self._keyword_scores(query))
     
     def get_confidence_scores(self, query):
         """
@@ -300,53 +402,161 @@ class SBERTQueryClassifier:
         Returns:
             dict: Dictionary with confidence scores for each category
         """
-        if self.use_fallback:
-            query_lower = query.lower()
-            scores = {}
-            total_keywords = 0
-            
-            for category, data in self.categories.items():
-                score = 0
-                for keyword in data['keywords']:
-                    if keyword.lower() in query_lower:
-                        score += 1
-                scores[category] = score
-                total_keywords += score
-            
-            confidence = {}
-            if total_keywords > 0:
-                for category, score in scores.items():
-                    confidence[category] = (score / total_keywords) * 100
-            else:
-                for category in scores.keys():
-                    confidence[category] = 25.0
-            
-            return confidence
+        if not self.use_fallback:
+            similarities, _, _ = self._semantic_similarities(query)
+            if similarities is not None:
+                return self._semantic_confidence(similarities)
+        return self._keyword_confidence(self._keyword_scores(query))
+    
+    def classify_with_details(self, query, semantic=True, include_embedding=False):
+        """
+        Classify a query and get its confidence scores with a single encode
         
-        try:
-            query_embedding = self.model.encode(query, convert_to_tensor=True)
-            
-            similarities = {}
-            for category, embedding in self.category_embeddings.items():
-                similarity = util.pytorch_cos_sim(query_embedding, embedding).item()
-                similarities[category] = similarity
+        Args:
+            query (str): The query to classify
+            semantic (bool): False to skip the encoder and use keywords only,
+                e.g. when the caller is shedding load
+            include_embedding (bool): Add the query embedding as a numpy
+                array under 'embedding' when the encoder was used
             
-            total = sum(max(0, sim) for sim in similarities.values())
+        Returns:
+            dict: 'category', 'confidence_scores' and 'degraded'; degraded
+                results also carry a 'degraded_reason'
+        """
+        reason = None if semantic else "load_shedding"
+        if semantic and not self.use_fallback:
+            similarities, reason, query_embedding = self._semantic_similarities(query)
+            if similarities is not None:
+                details = {
+                    "category": self._semantic_category(similarities),
+                    "confidence_scores": self._semantic_confidence(similarities),
+                    "degraded": False
+                }
+                if include_embedding:
+                    if hasattr(query_embedding, 'cpu'):
+                        query_embedding = query_embedding.cpu().numpy()
+                    details["embedding"] = np.asarray(query_embedding)
+                return details
+        
+        scores = self._keyword_scores(query)
+        details = {
+            "category": self._keyword_category(scores),
+            "confidence_scores": self._keyword_confidence(scores),
+            "degraded": reason is not None
+        }
+        if reason is not None:
+            details["degraded_reason"] = reason
+        return details
+    
+    def classify_long(self, query, semantic=True, max_words=32, overlap=8, min_similarity=0.3,
+                      min_margin=0.05):
+        """
+        Multi-label classification of a long complaint mixing several issues
+        
+        The text is split with split_into_chunks(), all chunks are encoded
+        in one batch and each chunk votes for its best category, but only
+        if that category is similar enough to the chunk and clearly ahead
+        of the runner-up (with keywords, strictly ahead). Every category
+        that wins at least one chunk becomes a label whose confidence is
+        the highest share it got in any chunk. When no chunk votes, the
+        category is the strict best of the averaged scores, if any, and
+        there are no labels. The cost grows linearly with the text length
+        since chunks are bounded in size.
+        
+        Args:
+            query (str): The complaint text
+            semantic (bool): False to use keywords only, e.g. when shedding load
+            max_words (int): Longest chunk, in words
+            overlap (int): Words shared by consecutive windows of one clause
+            min_similarity (float): Lowest cosine similarity a chunk needs to
+                vote for a category
+            min_margin (float): Lowest lead in cosine similarity of the
+                chunk's best category over its second best
             
-            confidence = {}
-            if total > 0:
-                for category, similarity in similarities.items():
-                    confidence[category] = (max(0, similarity) / total) * 100
+        Returns:
+            dict: 'category' (strongest label), 'labels' (list of dicts with
+                'category', 'confidence' and 'chunks' indices), 'chunks',
+                'confidence_scores' (averaged over chunks, a chunk without
+                keyword matches counting as zero) and 'degraded'
+        """
+        chunks = split_into_chunks(query, max_words=max_words, overlap=overlap) or [query]
+        
+        reason = None if semantic else "load_shedding"
+        per_chunk = None
+        if semantic and not self.use_fallback and not self._is_trained():
+            reason = "untrained"
+        elif semantic and not self.use_fallback:
+            breaker = self._circuit_breaker()
+            if breaker.allow():
+                try:
+                    per_chunk = [
+                        self._similarities(embedding) for embedding in self._encode_queries(chunks)
+                    ]
+                    breaker.record_success()
+                except Exception as e:
+                    print(f"Error during classification: {e}")
+                    print("Falling back to keyword-based classification")
+                    breaker.record_failure()
+                    reason = "encoder_error"
             else:
-                for category in similarities:
-                    confidence[category] = 0
-            
-            return confidence
-        except Exception as e:
-            print(f"Error during confidence calculation: {e}")
-            print("Falling back to keyword-based confidence scores")
-            self.use_fallback = True
-            return self.get_confidence_scores(query) 
+                reason = "circuit_open"
+        
+        votes = []
+        if per_chunk is not None:
+            for similarities in per_chunk:
+                best = self._semantic_category(similarities)
+                confidence = self._semantic_confidence(similarities)
+                if best != "unknown":
+                    runner_up = max((sim for c, sim in similarities.items() if c != best), default=-1.0)
+                    if similarities[best] < min_similarity or similarities[best] - runner_up < min_margin:
+                        best = "unknown"
+                votes.append((best, confidence))
+        else:
+            for chunk in chunks:
+                scores = self._keyword_scores(chunk)
+                best = self._keyword_category(scores)
+                # A tie between categories says nothing about the chunk
+                if best != "unknown" and sorted(scores.values())[-2:].count(scores[best]) > 1:
+                    best = "unknown"
+                # Without matches the placeholder shares would skew the average
+                if any(scores.values()):
+                    confidence = self._keyword_confidence(scores)
+                else:
+                    confidence = dict.fromkeys(scores, 0)
+                votes.append((best, confidence))
+        
+        labels = {}
+        for index, (best, confidence) in enumerate(votes):
+            if best == "unknown":
+                continue
+            label = labels.setdefault(best, {"category": best, "confidence": 0, "chunks": []})
+            label["confidence"] = max(label["confidence"], confidence[best])
+            label["chunks"].append(index)
+        labels = sorted(labels.values(), key=lambda label: label["confidence"], reverse=True)
+        
+        confidence_scores = {}
+        for _, confidence in votes:
+            for category, value in confidence.items():
+                confidence_scores[category] = confidence_scores.get(category, 0) + value / len(votes)
+        
+        top = sorted(confidence_scores.values())[-2:]
+        if labels:
+            category = labels[0]["category"]
+        elif top and top[-1] > 0 and (len(top) == 1 or top[1] > top[0]):
+            category = max(confidence_scores, key=confidence_scores.get)
+        else:
+            category = "unknown"
+        
+        details = {
+            "category": category,
+            "confidence_scores": confidence_scores,
+            "labels": labels,
+            "chunks": chunks,
+            "degraded": reason is not None
+        }
+        if reason is not None:
+            details["degraded_reason"] = reason
+        return details
     
     def save_model(self, file_path='model.pkl'):
         """
@@ -377,19 +587,62 @@ class SBERTQueryClassifier:
         print(f"Model loaded successfully from {file_path}")
         return model 
     
+    def _trimmed_examples(self, examples, query):
+        # Without embeddings there is nothing to pick a coreset from, so
+        # fallback mode keeps the newest examples
+        if query in examples:
+            return None
+        examples = list(examples) + [query]
+        budget = getattr(self, 'example_budget', None)
+        if self.use_fallback and budget is not None and len(examples) > budget:
+            examples = examples[len(examples) - budget:]
+        return examples
+    
+    def _append_example(self, category, query):
+        """
+        Record an example for a category that has no example store yet
+        
+        Returns:
+            bool: False if the example is already known
+        """
+        examples = self._trimmed_examples(self._examples(category), query)
+        if examples is None:
+            return False
+        self.taxonomy = self.taxonomy.with_category_examples(category, examples)
+        return True
+    
     def add_training_example(self, query, category):
         """
         Add a new training example to a category
         
+        Once trained, only the new example is encoded and only its category
+        centroid is recomputed; call train() or save_model() to persist it.
+        Near-duplicates are dropped and the category is kept within
+        example_budget by evicting its most redundant example.
+        
         Args:
             query (str): The query to add as an example
             category (str): The category to add the example to
+            
+        Returns:
+            bool: False if the example was dropped as a duplicate
         """
-        if category in self.categories:
-            self.categories[category]['examples'].append(query)
-            self.train()
-        else:
+        if category not in self.categories:
             raise ValueError(f"Category '{category}' not found")
+        
+        stores = getattr(self, 'example_stores', {})
+        if self.use_fallback or category not in stores:
+            if not self._append_example(category, query):
+                return False
+            # train() rebuilds the example stores, applying the budget
+            self.train()
+            return True
+        
+        embedding = self.model.encode([query], convert_to_numpy=True)[0]
+        if not stores[category].add(query, embedding):
+            return False
+        self._refresh_category(category)
+        return True
 
 if __name__ == "__main__":
     classifier = SBERTQueryClassifier()
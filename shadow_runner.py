@@ -0,0 +1,188 @@
+import time
+import queue
+import random
+import threading
+from collections import deque, Counter
+import numpy as np
+
+_STOP = object()
+
+
+class ShadowRunner:
+    """
+    Classify a sample of live queries with a candidate model, off the request path
+
+    submit() only samples and puts the query on a bounded queue; a single
+    background thread classifies it with the candidate and compares the
+    result with the production decision. The worker keeps its CPU use to
+    about cpu_share of one core: after each query it sleeps long enough
+    that the CPU time used meanwhile stays below that fraction of wall
+    time. CPU time is measured for the whole process, so the encoder's
+    intra-op threads are included; work done by request threads during
+    the same call is counted too, which only makes the worker back off
+    more when production is busy. When the worker falls behind, new
+    samples are dropped and counted rather than queued without bound.
+    """
+    def __init__(self, candidate, version=None, sample_rate=0.1, cpu_share=0.1,
+                 queue_size=256, window=1000, seed=None):
+        """
+        Start the shadow worker
+
+        Args:
+            candidate: Classifier under evaluation
+            version (str): Version label of the candidate model
+            sample_rate (float): Fraction of submitted queries to shadow
+            cpu_share (float): Upper bound on the worker's CPU time per
+                wall second
+            queue_size (int): Maximum queries waiting for the candidate
+            window (int): Number of recent latencies and deltas kept
+            seed (int): Optional seed of the sampler
+        """
+        if not 0 < cpu_share <= 1:
+            raise ValueError("cpu_share must be in (0, 1]")
+        self.candidate = candidate
+        self.version = version
+        self.sample_rate = sample_rate
+        self.cpu_share = cpu_share
+
+        self.submitted = 0
+        self.dropped = 0
+        self.compared = 0
+        self.agreed = 0
+        self.errors = 0
+        self.cpu_seconds = 0.0
+        self.throttled_seconds = 0.0
+        self.disagreements = Counter()
+        self._latencies = deque(maxlen=window)
+        self._deltas = deque(maxlen=window)
+        self._random = random.Random(seed)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name="shadow-runner", daemon=True)
+        self._thread.start()
+
+    def submit(self, query, category, confidence_scores):
+        """
+        Maybe queue a production decision for comparison; never blocks
+
+        Args:
+            query (str): The classified query
+            category (str): Category returned to the caller
+            confidence_scores (dict): Production confidence per category
+
+        Returns:
+            bool: True if the query was queued for the candidate
+        """
+        self.submitted += 1
+        if self._closed or self._random.random() >= self.sample_rate:
+            return False
+        try:
+            self._queue.put_nowait((query, category, confidence_scores))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _classify(self, query):
+        if hasattr(self.candidate, "classify_with_details"):
+            details = self.candidate.classify_with_details(query)
+            return details["category"], details["confidence_scores"]
+        return self.candidate.classify_query(query), self.candidate.get_confidence_scores(query)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            query, category, confidence_scores = item
+
+            cpu_start = time.process_time()
+            start = time.perf_counter()
+            try:
+                candidate_category, candidate_scores = self._classify(query)
+            except Exception as e:
+                print(f"⚠️ Shadow classification failed: {e}")
+                candidate_category = None
+            latency_ms = (time.perf_counter() - start) * 1000
+            cpu = time.process_time() - cpu_start
+
+            with self._lock:
+                self.cpu_seconds += cpu
+                if candidate_category is None:
+                    self.errors += 1
+                else:
+                    self.compared += 1
+                    self._latencies.append(latency_ms)
+                    # How much more (or less) sure the candidate is of the
+                    # category production chose
+                    self._deltas.append(
+                        candidate_scores.get(category, 0) - confidence_scores.get(category, 0)
+                    )
+                    if candidate_category == category:
+                        self.agreed += 1
+                    else:
+                        self.disagreements[(category, candidate_category)] += 1
+
+            # Idle for (1 - share) / share of the CPU just used
+            pause = cpu * (1 - self.cpu_share) / self.cpu_share
+            if pause > 0:
+                self.throttled_seconds += pause
+                time.sleep(pause)
+
+    def close(self, timeout=5.0):
+        """
+        Stop the worker after the queries already queued
+
+        Waits at most timeout seconds; if the queue is still full by then,
+        the remaining queries are dropped so that shutdown never blocks.
+        """
+        self._closed = True
+        if self._thread.is_alive():
+            deadline = time.monotonic() + timeout
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                while True:
+                    try:
+                        self._queue.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        break
+                try:
+                    self._queue.put_nowait(_STOP)
+                except queue.Full:
+                    pass
+            self._thread.join(max(0.0, deadline - time.monotonic()))
+
+    def stats(self):
+        with self._lock:
+            latencies = np.array(self._latencies)
+            deltas = np.array(self._deltas)
+            stats = {
+                "candidate_version": self.version,
+                "sample_rate": self.sample_rate,
+                "cpu_share": self.cpu_share,
+                "submitted": self.submitted,
+                "queued": self._queue.qsize(),
+                "dropped": self.dropped,
+                "compared": self.compared,
+                "errors": self.errors,
+                "agreement": self.agreed / self.compared if self.compared else None,
+                "cpu_seconds": self.cpu_seconds,
+                "throttled_seconds": self.throttled_seconds,
+                "top_disagreements": [
+                    {"production": production, "candidate": candidate, "count": count}
+                    for (production, candidate), count in self.disagreements.most_common(10)
+                ]
+            }
+        if len(latencies):
+            stats["latency_ms"] = {
+                f"p{p}": float(np.percentile(latencies, p)) for p in (50, 95, 99)
+            }
+            stats["confidence_delta"] = {
+                "mean": float(deltas.mean()),
+                "mean_abs": float(np.abs(deltas).mean())
+            }
+        return stats
@@ -0,0 +1,214 @@
+import os
+import re
+import sys
+import json
+from functools import lru_cache
+from types import MappingProxyType
+
+TAXONOMY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "taxonomy.json")
+
+
+class KeywordMatcher:
+    """
+    Keyword lookup compiled once for a set of categories
+
+    Each distinct keyword is stored once with the indices of every category
+    that lists it, so a keyword shared by several categories is only
+    searched for once per query. Matching keeps the substring semantics the
+    classifiers have always used.
+    """
+    __slots__ = ('names', 'keywords', 'keyword_categories')
+
+    def __init__(self, names, keywords_per_category):
+        """
+        Compile the matcher
+
+        Args:
+            names (tuple): Category names, in index order
+            keywords_per_category (iterable): One keyword sequence per category
+        """
+        table = {}
+        for index, keywords in enumerate(keywords_per_category):
+            for keyword in keywords:
+                owners = table.setdefault(sys.intern(keyword.lower()), [])
+                if index not in owners:
+                    owners.append(index)
+        self.names = tuple(names)
+        self.keywords = tuple(table)
+        self.keyword_categories = tuple(tuple(owners) for owners in table.values())
+
+    def counts(self, text):
+        """
+        Count matched keywords per category index
+
+        Args:
+            text (str): Lower-cased query text
+
+        Returns:
+            list: Number of matched keywords for each category
+        """
+        counts = [0] * len(self.names)
+        for keyword, owners in zip(self.keywords, self.keyword_categories):
+            if keyword in text:
+                for index in owners:
+                    counts[index] += 1
+        return counts
+
+    def scores(self, text):
+        """
+        Count matched keywords per category name
+
+        Args:
+            text (str): Lower-cased query text
+
+        Returns:
+            dict: Number of matched keywords for each category
+        """
+        return dict(zip(self.names, self.counts(text)))
+
+
+class Taxonomy:
+    """
+    Immutable category table shared by every classifier
+
+    Category data is held in tuples of interned strings, indexed by the
+    position of the category in names, with keyword and regex matchers
+    compiled once at load time.
+    """
+    __slots__ = ('name', 'names', 'index', 'keywords', 'examples', 'patterns',
+                 'keyword_matcher', 'categories')
+
+    def __init__(self, name, categories):
+        """
+        Build a taxonomy
+
+        Args:
+            name (str): Name of the taxonomy
+            categories (dict): Category name to a dict with 'keywords' and
+                optionally 'examples' and 'patterns'
+        """
+        names = tuple(sys.intern(category) for category in categories)
+        set_ = super().__setattr__
+        set_('name', name)
+        set_('names', names)
+        set_('index', MappingProxyType({category: i for i, category in enumerate(names)}))
+        set_('keywords', tuple(
+            tuple(sys.intern(k) for k in categories[c].get('keywords', ())) for c in names
+        ))
+        set_('examples', tuple(tuple(categories[c].get('examples', ())) for c in names))
+        set_('patterns', tuple(
+            tuple(re.compile(p) for p in categories[c].get('patterns', ())) for c in names
+        ))
+        set_('keyword_matcher', KeywordMatcher(names, self.keywords))
+        set_('categories', MappingProxyType({
+            category: MappingProxyType({
+                'keywords': self.keywords[i],
+                'examples': self.examples[i],
+                'patterns': tuple(p.pattern for p in self.patterns[i])
+            })
+            for i, category in enumerate(names)
+        }))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Taxonomy is immutable")
+
+    def __reduce__(self):
+        return (Taxonomy, (self.name, self._source()))
+
+    def _source(self):
+        return {
+            category: {
+                'keywords': list(self.keywords[i]),
+                'examples': list(self.examples[i]),
+                'patterns': [p.pattern for p in self.patterns[i]]
+            }
+            for i, category in enumerate(self.names)
+        }
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, category):
+        return category in self.index
+
+    def pattern_counts(self, text):
+        """
+        Count regex matches per category index
+
+        Args:
+            text (str): Preprocessed query text
+
+        Returns:
+            list: Number of pattern matches for each category
+        """
+        return [sum(len(p.findall(text)) for p in patterns) for patterns in self.patterns]
+
+    def categories_dict(self):
+        """
+        Mutable copy in the {category: {'keywords', 'examples'}} form, for
+        callers that edit categories in place (e.g. the nodes of a
+        HierarchicalQueryClassifier tree)
+
+        Returns:
+            dict: Fresh per-category dicts with list values
+        """
+        return {
+            category: {
+                'keywords': list(self.keywords[i]),
+                'examples': list(self.examples[i])
+            }
+            for i, category in enumerate(self.names)
+        }
+
+    def with_examples(self, extra_examples):
+        """
+        Return a new taxonomy with extra examples appended, skipping repeats
+        and unknown categories
+
+        Args:
+            extra_examples (dict): Category name to a list of example texts,
+                as in training_data.json
+
+        Returns:
+            Taxonomy: The extended taxonomy
+        """
+        categories = self._source()
+        for category, data in categories.items():
+            for example in extra_examples.get(category, []):
+                if example not in data['examples']:
+                    data['examples'].append(example)
+        return Taxonomy(self.name, categories)
+
+    def with_category_examples(self, category, examples):
+        """
+        Return a new taxonomy with one category's examples replaced
+
+        Args:
+            category (str): Category to change
+            examples (list): Its new example texts
+
+        Returns:
+            Taxonomy: The changed taxonomy
+        """
+        categories = self._source()
+        categories[category]['examples'] = list(examples)
+        return Taxonomy(self.name, categories)
+
+
+@lru_cache(maxsize=None)
+def load_taxonomy(name="civic", path=TAXONOMY_PATH):
+    """
+    Load a taxonomy from the data file, once per process
+
+    Args:
+        name (str): Top-level key in the data file ('civic' or 'departments')
+        path (str): Path to the taxonomy JSON file
+
+    Returns:
+        Taxonomy: The shared taxonomy instance
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if name not in data:
+        raise ValueError(f"Taxonomy '{name}' not found in {path}")
+    return Taxonomy(name, data[name])
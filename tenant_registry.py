@@ -0,0 +1,381 @@
+import os
+import re
+import sys
+import time
+import pickle
+import threading
+from collections import OrderedDict, deque
+import numpy as np
+from model_watcher import read_artifact
+from taxonomy import KeywordMatcher
+
+TENANT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+MODEL_DATA_FILE = "model_data.pkl"
+
+
+def _deep_sizeof(value):
+    # Approximate resident size of the nested dicts, lists and strings kept
+    # for keyword scoring
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_deep_sizeof(k) + _deep_sizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_deep_sizeof(item) for item in value)
+    return size
+
+
+class TenantModel:
+    """
+    Centroid matrix, categories and keyword matcher of one tenant, without
+    its own encoder
+    """
+    def __init__(self, tenant, model_name, categories, names, centroids, load_seconds, version=None):
+        self.tenant = tenant
+        self.model_name = model_name
+        self.categories = categories
+        self.names = names
+        self.centroids = centroids
+        self.load_seconds = load_seconds
+        self.version = version
+        self.matcher = KeywordMatcher(
+            categories.keys(), [data['keywords'] for data in categories.values()]
+        )
+        self.categories_bytes = _deep_sizeof(categories)
+
+    @property
+    def dimension(self):
+        return self.centroids.shape[1] if len(self.names) else None
+
+    @property
+    def nbytes(self):
+        return self.centroids.nbytes + self.categories_bytes
+
+    @classmethod
+    def from_model_data(cls, tenant, path):
+        """
+        Build a tenant model from the model_data.pkl written by
+        SBERTQueryClassifier.train()
+
+        Args:
+            tenant (str): Tenant id
+            path (str): Path to the tenant's model_data.pkl
+
+        Returns:
+            TenantModel: The loaded tenant model
+        """
+        start = time.perf_counter()
+        data, version = read_artifact(path)
+        model_data = pickle.loads(data)
+
+        names = tuple(model_data['category_embeddings'].keys())
+        if names:
+            centroids = np.vstack([
+                np.asarray(model_data['category_embeddings'][name], dtype=np.float32)
+                for name in names
+            ])
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            centroids /= np.where(norms > 0, norms, 1)
+        else:
+            centroids = np.zeros((0, 0), dtype=np.float32)
+
+        return cls(tenant, model_data['model_name'], model_data['categories'],
+                   names, centroids, time.perf_counter() - start, version)
+
+
+class _TenantStats:
+    def __init__(self, latency_window):
+        self.requests = 0
+        self.loads = 0
+        self.evictions = 0
+        self.last_load_seconds = None
+        self.latencies = deque(maxlen=latency_window)
+
+    def to_dict(self):
+        stats = {
+            "requests": self.requests,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "last_load_ms": None if self.last_load_seconds is None else self.last_load_seconds * 1000
+        }
+        if self.latencies:
+            latencies = np.array(self.latencies) * 1000
+            stats["latency_ms"] = {
+                "mean": float(latencies.mean()),
+                "p50": float(np.percentile(latencies, 50)),
+                "p95": float(np.percentile(latencies, 95))
+            }
+        return stats
+
+
+class TenantRegistry:
+    """
+    Per-tenant taxonomies served by one shared SBERT encoder
+
+    Each tenant lives in its own directory (tenants_dir/<tenant>/model_data.pkl,
+    as produced by SBERTQueryClassifier.train(save_path=...)). Tenants are
+    loaded on first use and the least recently used ones are evicted when the
+    resident centroid matrices and category data exceed the memory budget.
+    """
+    def __init__(self, classifier, tenants_dir="tenants", memory_budget_mb=256, latency_window=1000):
+        """
+        Initialize the registry
+
+        Args:
+            classifier: Loaded classifier whose SBERT model is shared by all
+                tenants; keyword scoring is used if it has no model
+            tenants_dir (str): Directory holding one sub-directory per tenant
+            memory_budget_mb (float): Budget for resident tenant models
+            latency_window (int): Number of recent latencies kept per tenant
+        """
+        self.classifier = classifier
+        self.tenants_dir = tenants_dir
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self.latency_window = latency_window
+
+        self._models = OrderedDict()
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def _shared_encoder(self):
+        # Name and embedding size of the shared encoder; the size is None if
+        # the model cannot report it
+        model = getattr(self.classifier, 'model', None)
+        dimension = getattr(model, 'get_sentence_embedding_dimension', None)
+        return getattr(self.classifier, 'model_name', None), dimension() if dimension else None
+
+    def _compatible(self, model, encoder):
+        name, dimension = encoder
+        if not model.names:
+            return True
+        if name is not None and model.model_name != name:
+            return False
+        return dimension is None or model.dimension == dimension
+
+    def set_classifier(self, classifier):
+        """
+        Switch to a new shared classifier, e.g. after a model reload
+
+        Resident tenants built for another encoder are evicted; they are
+        loaded and validated again on their next request.
+
+        Args:
+            classifier: The newly loaded classifier
+        """
+        with self._lock:
+            self.classifier = classifier
+            encoder = self._shared_encoder()
+            for tenant in [t for t, m in self._models.items() if not self._compatible(m, encoder)]:
+                del self._models[tenant]
+                self._stats_for(tenant).evictions += 1
+
+    def _tenant_path(self, tenant):
+        if not TENANT_ID_PATTERN.match(tenant):
+            raise ValueError(f"Invalid tenant id '{tenant}'")
+        return os.path.join(self.tenants_dir, tenant, MODEL_DATA_FILE)
+
+    def _stats_for(self, tenant):
+        if tenant not in self._stats:
+            self._stats[tenant] = _TenantStats(self.latency_window)
+        return self._stats[tenant]
+
+    def _resident_bytes(self):
+        return sum(model.nbytes for model in self._models.values())
+
+    def _evict(self, keep):
+        while self._resident_bytes() > self.memory_budget and len(self._models) > 1:
+            tenant, _ = next(iter(self._models.items()))
+            if tenant == keep:
+                self._models.move_to_end(tenant)
+                continue
+            del self._models[tenant]
+            self._stats_for(tenant).evictions += 1
+
+    def get(self, tenant):
+        """
+        Return a tenant's model, loading it from disk on first use
+
+        Args:
+            tenant (str): Tenant id
+
+        Returns:
+            TenantModel: The tenant model
+
+        Raises:
+            ValueError: If the tenant id is malformed
+            KeyError: If the tenant has no model data on disk
+            RuntimeError: If its embeddings were built with a different
+                encoder than the shared one
+        """
+        path = self._tenant_path(tenant)
+        with self._lock:
+            if tenant in self._models:
+                self._models.move_to_end(tenant)
+                return self._models[tenant]
+        if not os.path.exists(path):
+            raise KeyError(f"Tenant '{tenant}' not found")
+        with self._lock:
+            load_lock = self._load_locks.setdefault(tenant, threading.Lock())
+
+        # Load outside the registry lock so other tenants keep being served
+        try:
+            with load_lock:
+                return self._load(tenant, path)
+        finally:
+            # Only tenants being loaded right now hold a lock entry
+            with self._lock:
+                if self._load_locks.get(tenant) is load_lock and not load_lock.locked():
+                    del self._load_locks[tenant]
+
+    def _load(self, tenant, path):
+        with self._lock:
+            if tenant in self._models:
+                return self._models[tenant]
+        if not os.path.exists(path):
+            raise KeyError(f"Tenant '{tenant}' not found")
+
+        model = TenantModel.from_model_data(tenant, path)
+        encoder = self._shared_encoder()
+        if not self._compatible(model, encoder):
+            raise RuntimeError(
+                f"Tenant '{tenant}' was trained with '{model.model_name}' ({model.dimension} dims), "
+                f"shared encoder is '{encoder[0]}' ({encoder[1]} dims)"
+            )
+
+        with self._lock:
+            self._models[tenant] = model
+            stats = self._stats_for(tenant)
+            stats.loads += 1
+            stats.last_load_seconds = model.load_seconds
+            self._evict(keep=tenant)
+        return model
+
+    def _uses_encoder(self, model):
+        return (
+            model.names
+            and not getattr(self.classifier, 'use_fallback', True)
+            and hasattr(self.classifier, 'model')
+        )
+
+    def _keyword_scores(self, model, query):
+        return model.matcher.scores(query.lower())
+
+    def _encoder_similarities(self, model, query):
+        # Tenants share the default classifier's encoder, so they also share
+        # its circuit breaker
+        breaker = self.classifier._circuit_breaker()
+        if not breaker.allow():
+            return None, "circuit_open"
+        try:
+            query_embedding = self.classifier.model.encode(
+                query, convert_to_numpy=True, normalize_embeddings=True
+            )
+        except Exception as e:
+            print(f"⚠️ Tenant encoding failed, using keywords: {e}")
+            breaker.record_failure()
+            return None, "encoder_error"
+        breaker.record_success()
+        if query_embedding.shape[-1] != model.centroids.shape[1]:
+            # The shared encoder was swapped after this tenant was loaded
+            return None, "encoder_mismatch"
+        sims = (model.centroids @ query_embedding).tolist()
+        return dict(zip(model.names, sims)), None
+
+    def classify_with_details(self, tenant, query, semantic=True):
+        """
+        Classify a query against a tenant's categories
+
+        Args:
+            tenant (str): Tenant id
+            query (str): The query to classify
+            semantic (bool): Use the shared encoder when available; False
+                forces keyword scoring, e.g. while shedding load
+
+        Returns:
+            dict: 'category', 'confidence_scores', 'degraded' and
+                'model_version' (of the tenant's model_data.pkl), plus
+                'degraded_reason' when the encoder could not be used
+        """
+        start = time.perf_counter()
+        model = self.get(tenant)
+
+        similarities, reason = None, None
+        if not semantic:
+            reason = "load_shedding"
+        elif self._uses_encoder(model):
+            similarities, reason = self._encoder_similarities(model, query)
+
+        if similarities is not None:
+            sims = list(similarities.values())
+            total = sum(max(0, sim) for sim in sims)
+            if total > 0:
+                confidence = {c: (max(0, sim) / total) * 100 for c, sim in similarities.items()}
+            else:
+                confidence = {c: 0 for c in similarities}
+            if all(sim == 0 for sim in sims):
+                category = "unknown"
+            else:
+                category = max(similarities, key=similarities.get)
+        else:
+            scores = self._keyword_scores(model, query)
+            total = sum(scores.values())
+            if total > 0:
+                confidence = {c: (score / total) * 100 for c, score in scores.items()}
+                category = max(scores, key=scores.get)
+            else:
+                confidence = {c: 0 for c in scores}
+                category = "unknown"
+
+        with self._lock:
+            stats = self._stats_for(tenant)
+            stats.requests += 1
+            stats.latencies.append(time.perf_counter() - start)
+
+        details = {
+            "category": category,
+            "confidence_scores": confidence,
+            "degraded": reason is not None,
+            "model_version": model.version
+        }
+        if reason is not None:
+            details["degraded_reason"] = reason
+        return details
+
+    def classify(self, tenant, query):
+        """
+        Classify a query against a tenant's categories
+
+        Args:
+            tenant (str): Tenant id
+            query (str): The query to classify
+
+        Returns:
+            tuple: (category, confidence) in the same form as
+                classify_query() and get_confidence_scores()
+        """
+        details = self.classify_with_details(tenant, query)
+        return details["category"], details["confidence_scores"]
+
+    def stats(self):
+        """
+        Report per-tenant latency and memory usage
+
+        Returns:
+            dict: Registry totals and a 'tenants' dict keyed by tenant id
+        """
+        with self._lock:
+            tenants = {}
+            for tenant, stats in self._stats.items():
+                entry = stats.to_dict()
+                model = self._models.get(tenant)
+                entry["resident"] = model is not None
+                entry["memory_bytes"] = model.nbytes if model is not None else 0
+                entry["categories"] = len(model.names) if model is not None else None
+                entry["model_version"] = model.version if model is not None else None
+                tenants[tenant] = entry
+            return {
+                "memory_budget_bytes": self.memory_budget,
+                "resident_bytes": self._resident_bytes(),
+                "resident_tenants": list(self._models.keys()),
+                "tenants": tenants
+            }
@@ -0,0 +1,172 @@
+import math
+import time
+import threading
+from collections import OrderedDict
+
+LN2 = math.log(2)
+
+
+class _Series:
+    """
+    Counts for one category or (category, locality) key: a ring of time buckets plus
+    fast and slow exponentially decayed event rates
+    """
+    __slots__ = ('counts', 'epochs', 'total', 'fast_rate', 'slow_rate', 'last_update')
+
+    def __init__(self, num_buckets, now):
+        self.counts = [0] * num_buckets
+        self.epochs = [-1] * num_buckets
+        self.total = 0
+        self.fast_rate = 0.0
+        self.slow_rate = 0.0
+        self.last_update = now
+
+
+class TrendAggregator:
+    """
+    Fixed-memory, O(1)-per-event counts of classified complaints
+
+    Each category, and each (category, locality) pair, keeps num_buckets
+    time buckets in a ring and two decayed rates in events per second: a
+    fast one (short half-life) that reacts to surges and a slow one that
+    tracks the usual level. A spike is flagged when the fast rate exceeds
+    spike_ratio times the slow rate and min_spike_rate_per_hour. Series of
+    tenants are kept apart from each other and from the default model's.
+    Category series are few and always kept; at most max_series (category,
+    locality) pairs are tracked, and the least recently updated pair is
+    dropped when a new one arrives.
+    """
+    def __init__(self, bucket_seconds=60, num_buckets=60, fast_half_life=300,
+                 slow_half_life=6 * 3600, spike_ratio=3.0, min_spike_rate_per_hour=30,
+                 max_series=1000):
+        """
+        Initialize the aggregator
+
+        Args:
+            bucket_seconds (int): Width of a time bucket
+            num_buckets (int): Buckets kept per series
+            fast_half_life (float): Half-life in seconds of the fast rate
+            slow_half_life (float): Half-life in seconds of the slow rate
+            spike_ratio (float): Fast/slow rate ratio that counts as a spike
+            min_spike_rate_per_hour (float): Fast rate below which no spike
+                is reported, so a handful of complaints is not a surge
+            max_series (int): Maximum number of tracked (category, locality) pairs
+        """
+        self.bucket_seconds = bucket_seconds
+        self.num_buckets = num_buckets
+        self.fast_decay = LN2 / fast_half_life
+        self.slow_decay = LN2 / slow_half_life
+        self.spike_ratio = spike_ratio
+        self.min_spike_rate = min_spike_rate_per_hour / 3600
+        self.max_series = max_series
+
+        self._categories = {}
+        self._series = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _decay(self, series, now):
+        elapsed = max(0.0, now - series.last_update)
+        series.fast_rate *= math.exp(-self.fast_decay * elapsed)
+        series.slow_rate *= math.exp(-self.slow_decay * elapsed)
+        series.last_update = max(series.last_update, now)
+
+    def _locality_series(self, key, now):
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = _Series(self.num_buckets, now)
+            if len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+        else:
+            self._series.move_to_end(key)
+        return series
+
+    def _update(self, series, now):
+        epoch = int(now // self.bucket_seconds)
+        slot = epoch % self.num_buckets
+        if series.epochs[slot] != epoch:
+            series.epochs[slot] = epoch
+            series.counts[slot] = 0
+        series.counts[slot] += 1
+        series.total += 1
+
+        # Each event adds an impulse whose decayed integral is one event
+        self._decay(series, now)
+        series.fast_rate += self.fast_decay
+        series.slow_rate += self.slow_decay
+
+    def record(self, category, locality=None, now=None, tenant=None):
+        """
+        Count one classified complaint
+
+        Args:
+            category (str): Predicted category
+            locality (str): Optional locality reported with the complaint
+            now (float): Timestamp in seconds; defaults to time.time()
+            tenant (str): Tenant whose model classified it; None for the
+                default model
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            series = self._categories.get((tenant, category))
+            if series is None:
+                series = self._categories[(tenant, category)] = _Series(self.num_buckets, now)
+            self._update(series, now)
+            if locality:
+                self._update(self._locality_series((tenant, category, locality), now), now)
+
+    def _report(self, key, series, now, include_buckets):
+        self._decay(series, now)
+        current = int(now // self.bucket_seconds)
+        buckets = []
+        for epoch in range(current - self.num_buckets + 1, current + 1):
+            slot = epoch % self.num_buckets
+            buckets.append(series.counts[slot] if series.epochs[slot] == epoch else 0)
+
+        report = {
+            "tenant": key[0],
+            "category": key[1],
+            "locality": key[2],
+            "total": series.total,
+            "window_count": sum(buckets),
+            "rate_per_hour": series.fast_rate * 3600,
+            "baseline_per_hour": series.slow_rate * 3600,
+            "spike": (series.fast_rate >= self.min_spike_rate
+                      and series.fast_rate >= self.spike_ratio * series.slow_rate)
+        }
+        if include_buckets:
+            report["buckets"] = buckets
+        return report
+
+    def snapshot(self, category=None, locality=None, include_buckets=False, now=None, tenant=None):
+        """
+        Report counts, rates and spike flags
+
+        Args:
+            category (str): Only report this category
+            locality (str): Only report this locality; without it only
+                category-level series are reported
+            include_buckets (bool): Add per-bucket counts, oldest first
+            now (float): Timestamp in seconds; defaults to time.time()
+            tenant (str): Only report this tenant; None for the default model
+
+        Returns:
+            dict: Window settings and a list of per-series 'trends'
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if locality:
+                items = self._series.items()
+            else:
+                items = ((key + (None,), series) for key, series in self._categories.items())
+            trends = [
+                self._report(key, series, now, include_buckets)
+                for key, series in items
+                if key[0] == tenant and (category is None or key[1] == category) and key[2] == locality
+            ]
+        trends.sort(key=lambda trend: trend["rate_per_hour"], reverse=True)
+        return {
+            "bucket_seconds": self.bucket_seconds,
+            "num_buckets": self.num_buckets,
+            "spikes": [trend for trend in trends if trend["spike"]],
+            "trends": trends
+        }